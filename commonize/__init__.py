@@ -3,9 +3,20 @@ from typing import TYPE_CHECKING, Any
 
 from .common_size import (
     CommonSizeLine,
+    CompiledLayout,
+    PeerStatistics,
+    StatementBatch,
     StatementNotAvailableError,
+    StatementSeries,
     build_balance_sheet,
+    build_balance_sheet_series,
+    build_balance_sheets,
     build_income_statement,
+    build_income_statement_series,
+    build_income_statements,
+    build_statement,
+    build_statement_batch,
+    compile_layout,
 )
 from .cli import main as cli_main
 from .industry_cache import IndustryBenchmark, load_benchmark, store_benchmark
@@ -39,10 +50,21 @@ def worker_main(*args: Any, **kwargs: Any) -> None:  # pragma: no cover - thin w
 
 __all__ = [
     "CommonSizeLine",
+    "CompiledLayout",
+    "PeerStatistics",
+    "StatementBatch",
     "StatementNotAvailableError",
+    "StatementSeries",
     "SECClientError",
     "build_balance_sheet",
+    "build_balance_sheet_series",
+    "build_balance_sheets",
     "build_income_statement",
+    "build_income_statement_series",
+    "build_income_statements",
+    "build_statement",
+    "build_statement_batch",
+    "compile_layout",
     "cli_main",
     "create_app",
     "worker_main",
@@ -0,0 +1,156 @@
+"""Hydrate local caches from the SEC's nightly bulk archives.
+
+The SEC publishes ``companyfacts.zip`` and ``submissions.zip`` every night.
+Ingesting them fills the company facts cache and the CIK -> SIC map without a
+single per-company API call.  Archives are read member by member straight from
+the zip file, so nothing is unpacked to disk, and SIC records are written in
+batches, so memory use stays bounded by the largest individual document.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+import zipfile
+from calendar import timegm
+from dataclasses import dataclass
+from email.utils import formatdate
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Union
+
+from . import sec_client
+
+_MEMBER_PATTERN = re.compile(r"^CIK(\d{10})\.json$")
+
+# Number of SIC records buffered before they are written in one transaction.
+_SIC_BATCH_SIZE = 5000
+
+
+@dataclass
+class IngestSummary:
+    """Counts of the records written by a bulk ingest."""
+
+    company_facts: int = 0
+    industries: int = 0
+    skipped: int = 0
+
+
+def _member_cik(name: str) -> Optional[str]:
+    match = _MEMBER_PATTERN.match(Path(name).name)
+    if not match:
+        return None
+    return match.group(1)
+
+
+def _member_timestamp(member: zipfile.ZipInfo) -> float:
+    return float(timegm(member.date_time + (0, 0, -1)))
+
+
+def ingest_companyfacts_archive(
+    path: Union[str, Path], summary: Optional[IngestSummary] = None
+) -> IngestSummary:
+    """Stream every ``CIK##########.json`` member of ``path`` into the facts cache."""
+
+    summary = summary or IngestSummary()
+    with zipfile.ZipFile(path) as archive:
+        for member in archive.infolist():
+            cik = _member_cik(member.filename)
+            if cik is None or member.is_dir():
+                summary.skipped += 1
+                continue
+            timestamp = _member_timestamp(member)
+            with archive.open(member) as source:
+                sec_client.store_company_facts(
+                    cik,
+                    source,
+                    last_modified=formatdate(timestamp, usegmt=True),
+                    fetched_at=timestamp,
+                )
+            summary.company_facts += 1
+    return summary
+
+
+def ingest_submissions_archive(
+    path: Union[str, Path], summary: Optional[IngestSummary] = None
+) -> IngestSummary:
+    """Record the SIC code of every company in a ``submissions.zip`` archive."""
+
+    summary = summary or IngestSummary()
+    records: Dict[str, Dict[str, Optional[str]]] = {}
+    with zipfile.ZipFile(path) as archive:
+        for member in archive.infolist():
+            cik = _member_cik(member.filename)
+            if cik is None or member.is_dir():
+                # Paginated "-submissions-001.json" members carry filings only.
+                summary.skipped += 1
+                continue
+            with archive.open(member) as source:
+                try:
+                    submissions = json.load(source)
+                except ValueError:
+                    summary.skipped += 1
+                    continue
+            records[cik] = {
+                "sic": submissions.get("sic") or None,
+                "sic_description": submissions.get("sicDescription") or None,
+            }
+            summary.industries += 1
+            if len(records) >= _SIC_BATCH_SIZE:
+                sec_client.store_company_industries(records)
+                records = {}
+    sec_client.store_company_industries(records)
+    return summary
+
+
+def ingest_archives(
+    *,
+    companyfacts: Optional[Union[str, Path]] = None,
+    submissions: Optional[Union[str, Path]] = None,
+) -> IngestSummary:
+    """Ingest whichever bulk archives are provided."""
+
+    summary = IngestSummary()
+    if submissions:
+        ingest_submissions_archive(submissions, summary)
+    if companyfacts:
+        ingest_companyfacts_archive(companyfacts, summary)
+    return summary
+
+
+def parse_args(argv: Iterable[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Hydrate Commonize caches from SEC bulk companyfacts/submissions archives."
+    )
+    parser.add_argument("--companyfacts", type=Path, help="Path to companyfacts.zip.")
+    parser.add_argument("--submissions", type=Path, help="Path to submissions.zip.")
+    args = parser.parse_args(list(argv))
+    if not args.companyfacts and not args.submissions:
+        parser.error("provide --companyfacts and/or --submissions")
+    return args
+
+
+def main(argv: Iterable[str] | None = None) -> int:  # pragma: no cover - CLI entry point
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    try:
+        summary = ingest_archives(companyfacts=args.companyfacts, submissions=args.submissions)
+    except (OSError, zipfile.BadZipFile) as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+    print(
+        f"Ingested {summary.company_facts} company facts documents and "
+        f"{summary.industries} industry records ({summary.skipped} members skipped)."
+    )
+    return 0
+
+
+__all__ = [
+    "IngestSummary",
+    "ingest_archives",
+    "ingest_companyfacts_archive",
+    "ingest_submissions_archive",
+]
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())
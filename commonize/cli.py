@@ -21,6 +21,14 @@ def _statement_builder(name: str) -> Callable[[dict, str], List[common_size.Comm
     raise ValueError(f"Unsupported statement type '{name}'.")
 
 
+def _statement_layout(name: str) -> common_size.CompiledLayout:
+    if name == "income":
+        return common_size.INCOME_LAYOUT
+    if name == "balance":
+        return common_size.BALANCE_LAYOUT
+    raise ValueError(f"Unsupported statement type '{name}'.")
+
+
 def _render_table(lines: Iterable[common_size.CommonSizeLine]) -> str:
     rows = [line.as_row() for line in lines]
     headers = [
@@ -91,19 +99,21 @@ def main(argv: Iterable[str] | None = None) -> int:
         industry_info = sec_client.get_company_industry(ticker_info.cik)
         builder = _statement_builder(args.statement)
         lines = builder(facts, period=args.period)
+        layout = _statement_layout(args.statement)
 
         if args.industry_peers > 0:
             benchmark = industry_cache.load_benchmark(
                 industry_info.sic,
                 args.statement,
                 args.period,
-                expected_line_count=len(lines),
+                row_keys=layout.row_keys,
+                layout_fingerprint=layout.fingerprint,
             )
             if benchmark:
                 for idx, ratio in enumerate(benchmark.ratios):
                     if idx < len(lines) and ratio is not None:
                         lines[idx].industry_common_size = ratio
-            else:
+            if not benchmark or not benchmark.complete:
                 if args.queue_industry:
                     industry_jobs.ensure_benchmark_ready(
                         ticker_info,
@@ -111,6 +121,7 @@ def main(argv: Iterable[str] | None = None) -> int:
                         args.statement,
                         args.period,
                         max_companies=args.industry_peers,
+                        priority=industry_jobs.PRIORITY_CLI,
                     )
                 else:
                     _, peers, peer_fact_list = sec_client.fetch_peer_company_facts(
@@ -127,6 +138,8 @@ def main(argv: Iterable[str] | None = None) -> int:
                                 ratios,
                                 len(peers),
                                 line_count=len(lines),
+                                row_keys=layout.row_keys,
+                                layout_fingerprint=layout.fingerprint,
                             )
                         except ValueError:
                             pass
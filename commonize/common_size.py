@@ -1,12 +1,44 @@
 """Utilities to build common size financial statements."""
 from __future__ import annotations
 
+import hashlib
+import json
+import warnings
 from dataclasses import dataclass
-from typing import Callable, Iterable, List, Optional, Sequence, Tuple, Union
-
+from datetime import datetime
+from types import MappingProxyType
+from typing import (
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import numpy as np
 
 from . import sec_client
 
+# Fraction of peers dropped from each tail when computing trimmed means.
+_TRIM_FRACTION = 0.1
+
+
+@dataclass
+class PeerStatistics:
+    """Distribution of peer common size ratios for a single line item."""
+
+    mean: Optional[float]
+    median: Optional[float]
+    trimmed_mean: Optional[float]
+    p25: Optional[float]
+    p75: Optional[float]
+    count: int
+
 
 @dataclass
 class CommonSizeLine:
@@ -16,6 +48,7 @@ class CommonSizeLine:
     indent: int = 0
     is_header: bool = False
     industry_common_size: Optional[float] = None
+    industry_stats: Optional[PeerStatistics] = None
 
     def value_in_millions(self) -> Optional[float]:
         if self.value is None:
@@ -45,6 +78,7 @@ class StatementNotAvailableError(RuntimeError):
 
 
 TagSpec = Optional[Union[str, Sequence[str]]]
+FactsInput = Union[dict, sec_client.FactIndex]
 
 
 def _normalize_tag_spec(tag: TagSpec) -> Tuple[str, ...]:
@@ -55,30 +89,82 @@ def _normalize_tag_spec(tag: TagSpec) -> Tuple[str, ...]:
     return tuple(tag)
 
 
-def _build_lines(
-    facts: dict,
+@dataclass(frozen=True)
+class LayoutRow:
+    """A single pre-normalised line of a statement layout."""
+
+    label: str
+    tags: Tuple[str, ...]
+    indent: int
+    is_header: bool
+
+
+class _LayoutLookup:
+    __slots__ = ("_lines", "_label_index")
+
+    def __init__(self, lines: List[CommonSizeLine], label_index: Mapping[str, int]) -> None:
+        self._lines = lines
+        self._label_index = label_index
+
+    def get(self, label: str) -> Optional[CommonSizeLine]:
+        index = self._label_index.get(label)
+        if index is None or index >= len(self._lines):
+            return None
+        return self._lines[index]
+
+
+Derivation = Callable[[List[CommonSizeLine], "CompiledLayout"], None]
+
+
+@dataclass(frozen=True, eq=False)
+class CompiledLayout:
+    """A statement layout compiled once so builders never re-parse it.
+
+    ``fingerprint`` is a stable hash of the rows and denominator, suitable
+    for use in cache keys.  ``row_keys`` holds one hash per row covering its
+    label, tags and the denominator tags, so a cached ratio stays valid for
+    a row as long as none of those change, even if other rows are edited.
+    """
+
+    rows: Tuple[LayoutRow, ...]
+    denominator_index: int
+    label_index: Mapping[str, int]
+    tags: FrozenSet[str]
+    fingerprint: str
+    row_keys: Tuple[str, ...]
+    derive: Optional[Derivation] = None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def labels(self) -> List[str]:
+        return [row.label for row in self.rows]
+
+    @property
+    def denominator(self) -> LayoutRow:
+        return self.rows[self.denominator_index]
+
+    def lookup(self, lines: List[CommonSizeLine]) -> _LayoutLookup:
+        """Return a label -> line accessor for ``lines`` built from this layout."""
+
+        return _LayoutLookup(lines, self.label_index)
+
+
+def _layout_hash(canonical: str) -> str:
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def compile_layout(
     layout: Iterable[tuple],
     *,
-    period: str,
-    denominator_index: int,
-) -> List[CommonSizeLine]:
-    layout_list = list(layout)
-    lines: List[CommonSizeLine] = []
-    selected: dict[int, Tuple[Optional[dict], Optional[float]]] = {}
+    denominator_index: int = 0,
+    derive: Optional[Derivation] = None,
+) -> CompiledLayout:
+    """Compile ``(label, tags[, indent[, is_header]])`` tuples into a layout."""
 
-    reference_fact: Optional[dict] = None
-    if 0 <= denominator_index < len(layout_list):
-        denom_item = layout_list[denominator_index]
-        denom_tag = denom_item[1] if len(denom_item) >= 2 else None
-        for candidate_tag in _normalize_tag_spec(denom_tag):
-            fact = sec_client.select_fact(facts, candidate_tag, period=period)
-            value = sec_client.extract_value(fact)
-            if value is not None:
-                reference_fact = fact
-                selected[denominator_index] = (fact, value)
-                break
-
-    for index, item in enumerate(layout_list):
+    rows: List[LayoutRow] = []
+    for item in layout:
         if len(item) == 2:
             label, tag = item
             indent = 0
@@ -90,17 +176,60 @@ def _build_lines(
             label, tag, indent, is_header = item
         else:  # pragma: no cover - defensive guard
             raise ValueError("Layout entries must have 2 to 4 elements")
+        rows.append(LayoutRow(label, _normalize_tag_spec(tag), int(indent), bool(is_header)))
+
+    if not 0 <= denominator_index < len(rows):
+        raise ValueError("Denominator index is outside the layout")
+
+    canonical = json.dumps(
+        [denominator_index, [[row.label, row.tags, row.indent, row.is_header] for row in rows]]
+    )
+    denominator_tags = rows[denominator_index].tags
+    row_keys = tuple(
+        _layout_hash(json.dumps([row.label, row.tags, denominator_tags])) for row in rows
+    )
+    label_index: Dict[str, int] = {}
+    for index, row in enumerate(rows):
+        label_index.setdefault(row.label, index)
+    return CompiledLayout(
+        rows=tuple(rows),
+        denominator_index=denominator_index,
+        label_index=MappingProxyType(label_index),
+        tags=frozenset(tag for row in rows for tag in row.tags),
+        fingerprint=_layout_hash(canonical),
+        row_keys=row_keys,
+        derive=derive,
+    )
 
+
+def _build_lines(
+    facts: sec_client.FactIndex,
+    layout: CompiledLayout,
+    *,
+    period: str,
+) -> List[CommonSizeLine]:
+    lines: List[CommonSizeLine] = []
+    selected: dict[int, Tuple[Optional[dict], Optional[float]]] = {}
+
+    reference_fact: Optional[dict] = None
+    for candidate_tag in layout.denominator.tags:
+        fact = facts.select(candidate_tag, period=period)
+        value = sec_client.extract_value(fact)
+        if value is not None:
+            reference_fact = fact
+            selected[layout.denominator_index] = (fact, value)
+            break
+
+    for index, row in enumerate(layout.rows):
         fact: Optional[dict] = None
         value: Optional[float] = None
-        if is_header or tag is None:
+        if row.is_header or not row.tags:
             value = None
         elif index in selected:
             fact, value = selected[index]
         else:
-            for candidate_tag in _normalize_tag_spec(tag):
-                fact = sec_client.select_fact(
-                    facts,
+            for candidate_tag in row.tags:
+                fact = facts.select(
                     candidate_tag,
                     period=period,
                     reference=reference_fact,
@@ -111,11 +240,11 @@ def _build_lines(
 
         lines.append(
             CommonSizeLine(
-                label=label,
+                label=row.label,
                 value=value,
                 common_size=None,
-                indent=indent,
-                is_header=is_header,
+                indent=row.indent,
+                is_header=row.is_header,
             )
         )
     return lines
@@ -131,42 +260,228 @@ def _compute_common_size(lines: List[CommonSizeLine], *, denominator_index: int)
         line.common_size = line.value / denominator
 
 
-def _apply_industry_average(
-    lines: List[CommonSizeLine],
-    peer_facts: Iterable[dict],
+def _column_statistics(
+    matrix: np.ndarray, *, trim: float = _TRIM_FRACTION
+) -> Dict[str, np.ndarray]:
+    """Compute NaN-aware statistics for every column of ``matrix`` in one pass."""
+
+    present = ~np.isnan(matrix)
+    count = present.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(present, matrix, 0.0).sum(axis=0) / count
+
+        ordered = np.sort(matrix, axis=0)  # NaNs sort to the end of each column
+        ranks = np.arange(matrix.shape[0])[:, None]
+        cut = np.floor(count * trim).astype(int)
+        kept = (ranks >= cut) & (ranks < count - cut)
+        trimmed_mean = np.where(kept, ordered, 0.0).sum(axis=0) / kept.sum(axis=0)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN columns
+        p25, median, p75 = np.nanpercentile(matrix, [25, 50, 75], axis=0)
+
+    return {
+        "mean": mean,
+        "median": median,
+        "trimmed_mean": trimmed_mean,
+        "p25": p25,
+        "p75": p75,
+        "count": count,
+    }
+
+
+def summarize_peer_ratios(
+    peer_ratios: Union[np.ndarray, Sequence[Sequence[Optional[float]]]],
     *,
-    layout: Iterable[tuple],
-    denominator_index: int,
-    period: str,
-    derive_fn: Optional[Callable[[List[CommonSizeLine]], None]] = None,
-) -> None:
-    peer_ratios: List[List[Optional[float]]] = []
-    for facts in peer_facts:
-        peer_lines = _build_lines(
-            facts,
-            layout,
-            period=period,
-            denominator_index=denominator_index,
+    trim: float = _TRIM_FRACTION,
+) -> List[PeerStatistics]:
+    """Return per-line statistics for a peers x lines matrix of ratios.
+
+    Missing ratios may be given as ``None`` or NaN and are ignored.
+    """
+
+    matrix = np.array(peer_ratios, dtype=np.float64)
+    if matrix.ndim != 2 or matrix.shape[0] == 0:
+        return []
+    columns = _column_statistics(matrix, trim=trim)
+
+    def _value(name: str, index: int) -> Optional[float]:
+        value = columns[name][index]
+        return None if np.isnan(value) else float(value)
+
+    return [
+        PeerStatistics(
+            mean=_value("mean", index),
+            median=_value("median", index),
+            trimmed_mean=_value("trimmed_mean", index),
+            p25=_value("p25", index),
+            p75=_value("p75", index),
+            count=int(columns["count"][index]),
         )
-        if derive_fn is not None:
-            derive_fn(peer_lines)
+        for index in range(matrix.shape[1])
+    ]
+
+
+@dataclass
+class StatementBatch:
+    """Values and common size ratios for many companies sharing one layout.
+
+    ``values`` and ``ratios`` are companies x lines matrices with NaN for
+    missing data.  ``available`` flags the companies whose denominator was
+    present, i.e. whose ratio rows are meaningful.
+    """
+
+    labels: List[str]
+    values: np.ndarray
+    ratios: np.ndarray
+    available: np.ndarray
+
+
+def _build_batch(
+    facts_list: Iterable[FactsInput],
+    layout: CompiledLayout,
+    *,
+    period: str,
+) -> StatementBatch:
+    value_rows: List[List[float]] = []
+    ratio_rows: List[List[float]] = []
+    available: List[bool] = []
+    for facts in facts_list:
+        lines = _build_lines(sec_client.index_facts(facts), layout, period=period)
+        if layout.derive is not None:
+            layout.derive(lines, layout)
         try:
-            _compute_common_size(peer_lines, denominator_index=denominator_index)
+            _compute_common_size(lines, denominator_index=layout.denominator_index)
         except StatementNotAvailableError:
+            available.append(False)
+        else:
+            available.append(True)
+        value_rows.append([np.nan if line.value is None else line.value for line in lines])
+        ratio_rows.append(
+            [np.nan if line.common_size is None else line.common_size for line in lines]
+        )
+
+    shape = (len(value_rows), len(layout))
+    return StatementBatch(
+        labels=layout.labels,
+        values=np.array(value_rows, dtype=np.float64).reshape(shape),
+        ratios=np.array(ratio_rows, dtype=np.float64).reshape(shape),
+        available=np.array(available, dtype=bool),
+    )
+
+
+@dataclass
+class StatementSeries:
+    """Common size values for one company across several reporting periods.
+
+    ``values`` and ``ratios`` are lines x periods matrices with NaN for
+    missing data.  Columns are ordered newest first and labelled by the
+    period end dates in ``periods``.
+    """
+
+    labels: List[str]
+    periods: List[str]
+    values: np.ndarray
+    ratios: np.ndarray
+
+
+def _series_references(
+    facts: sec_client.FactIndex,
+    tags: Sequence[str],
+    *,
+    period: str,
+    periods: int,
+) -> List[dict]:
+    by_end: Dict[str, Tuple[datetime, dict]] = {}
+    for tag in tags:
+        for end_date, fact in facts.entries(tag, period=period):
+            if sec_client.extract_value(fact) is None:
+                continue
+            by_end.setdefault(fact.get("end"), (end_date, fact))
+    ordered = sorted(by_end.values(), key=lambda entry: entry[0], reverse=True)
+    return [fact for _, fact in ordered[:periods]]
+
+
+def _build_series(
+    facts: FactsInput,
+    layout: CompiledLayout,
+    *,
+    period: str,
+    periods: int,
+) -> StatementSeries:
+    index = sec_client.index_facts(facts)
+    references = _series_references(
+        index, layout.denominator.tags, period=period, periods=periods
+    )
+    column_values: List[List[Optional[float]]] = [[None] * len(layout) for _ in references]
+    for row_index, row in enumerate(layout.rows):
+        if row.is_header or not row.tags or not references:
             continue
-        peer_ratios.append([line.common_size for line in peer_lines])
+        missing = set(range(len(references)))
+        for tag in row.tags:
+            for column, fact in enumerate(index.align(tag, references, period=period)):
+                if column not in missing:
+                    continue
+                value = sec_client.extract_value(fact)
+                if value is not None:
+                    column_values[column][row_index] = value
+                    missing.discard(column)
+            if not missing:
+                break
+
+    values = np.full((len(layout), len(references)), np.nan)
+    ratios = np.full((len(layout), len(references)), np.nan)
+    for column, row_values in enumerate(column_values):
+        lines = [
+            CommonSizeLine(
+                label=row.label,
+                value=value,
+                common_size=None,
+                indent=row.indent,
+                is_header=row.is_header,
+            )
+            for row, value in zip(layout.rows, row_values)
+        ]
+        if layout.derive is not None:
+            layout.derive(lines, layout)
+        try:
+            _compute_common_size(lines, denominator_index=layout.denominator_index)
+        except StatementNotAvailableError:
+            pass
+        for row_index, line in enumerate(lines):
+            if line.value is not None:
+                values[row_index, column] = line.value
+            if line.common_size is not None:
+                ratios[row_index, column] = line.common_size
+
+    return StatementSeries(
+        labels=layout.labels,
+        periods=[reference.get("end") for reference in references],
+        values=values,
+        ratios=ratios,
+    )
 
-    if not peer_ratios:
+
+def _apply_industry_average(
+    lines: List[CommonSizeLine],
+    peer_facts: Iterable[FactsInput],
+    *,
+    layout: CompiledLayout,
+    period: str,
+) -> None:
+    batch = _build_batch(peer_facts, layout, period=period)
+    if not batch.available.any():
         return
 
-    for index, line in enumerate(lines):
-        values = [row[index] for row in peer_ratios if row[index] is not None]
-        if not values:
+    for line, stats in zip(lines, summarize_peer_ratios(batch.ratios[batch.available])):
+        if not stats.count:
             continue
-        line.industry_common_size = sum(values) / len(values)
+        line.industry_common_size = stats.mean
+        line.industry_stats = stats
+
 
-def _apply_income_derivations(lines: List[CommonSizeLine]) -> None:
-    lookup = {line.label: line for line in lines}
+def _apply_income_derivations(lines: List[CommonSizeLine], layout: CompiledLayout) -> None:
+    lookup = layout.lookup(lines)
 
     revenue = lookup.get("Revenue")
     cost = lookup.get("Cost of revenue")
@@ -228,8 +543,8 @@ def _apply_income_derivations(lines: List[CommonSizeLine]) -> None:
             gross.value = derived_gross
 
 
-def _apply_balance_derivations(lines: List[CommonSizeLine]) -> None:
-    lookup = {line.label: line for line in lines}
+def _apply_balance_derivations(lines: List[CommonSizeLine], layout: CompiledLayout) -> None:
+    lookup = layout.lookup(lines)
     total_assets = lookup.get("Total assets")
     total_liabilities = lookup.get("Total liabilities")
     total_equity = lookup.get("Total stockholders' equity")
@@ -437,58 +752,127 @@ _BALANCE_LAYOUT = [
     ),
 ]
 
+INCOME_LAYOUT = compile_layout(
+    _INCOME_LAYOUT, denominator_index=0, derive=_apply_income_derivations
+)
+BALANCE_LAYOUT = compile_layout(
+    _BALANCE_LAYOUT, denominator_index=0, derive=_apply_balance_derivations
+)
 
-def build_income_statement(
-    facts: dict,
+# Every us-gaap tag read by the statement layouts, for use with
+# ``sec_client.fetch_company_facts(..., tags=LAYOUT_TAGS)``.
+LAYOUT_TAGS: FrozenSet[str] = INCOME_LAYOUT.tags | BALANCE_LAYOUT.tags
+
+
+def build_statement(
+    facts: FactsInput,
+    layout: CompiledLayout,
     *,
     period: str = "annual",
-    peers: Optional[Iterable[dict]] = None,
+    peers: Optional[Iterable[FactsInput]] = None,
 ) -> List[CommonSizeLine]:
-    lines = _build_lines(
-        facts,
-        _INCOME_LAYOUT,
-        period=period,
-        denominator_index=0,
-    )
-    _apply_income_derivations(lines)
-    if lines[0].value is None or lines[0].value == 0:
-        raise StatementNotAvailableError("Revenue not available for common size computation.")
-    _compute_common_size(lines, denominator_index=0)
-    if peers:
-        _apply_industry_average(
-            lines,
-            peers,
-            layout=_INCOME_LAYOUT,
-            denominator_index=0,
-            period=period,
-            derive_fn=_apply_income_derivations,
+    """Build the common size statement described by ``layout``."""
+
+    lines = _build_lines(sec_client.index_facts(facts), layout, period=period)
+    if layout.derive is not None:
+        layout.derive(lines, layout)
+    denominator = lines[layout.denominator_index]
+    if denominator.value is None or denominator.value == 0:
+        raise StatementNotAvailableError(
+            f"{denominator.label} not available for common size computation."
         )
+    _compute_common_size(lines, denominator_index=layout.denominator_index)
+    if peers:
+        _apply_industry_average(lines, peers, layout=layout, period=period)
     return lines
 
 
+def build_statement_batch(
+    facts_list: Iterable[FactsInput],
+    layout: CompiledLayout,
+    *,
+    period: str = "annual",
+) -> StatementBatch:
+    """Build the statement described by ``layout`` for many companies."""
+
+    return _build_batch(facts_list, layout, period=period)
+
+
+def statement_accession(
+    facts: FactsInput,
+    layout: CompiledLayout,
+    *,
+    period: str = "annual",
+) -> Optional[str]:
+    """Return the accession number of the filing ``layout`` would be built from.
+
+    Only the denominator tags are indexed, so this is a cheap way to tell
+    whether a company has filed since its ratios were last computed.
+    """
+
+    index = sec_client.index_facts(facts)
+    for tag in layout.denominator.tags:
+        fact = index.select(tag, period=period)
+        if sec_client.extract_value(fact) is not None:
+            return fact.get("accn")
+    return None
+
+
+def build_income_statement(
+    facts: FactsInput,
+    *,
+    period: str = "annual",
+    peers: Optional[Iterable[FactsInput]] = None,
+) -> List[CommonSizeLine]:
+    return build_statement(facts, INCOME_LAYOUT, period=period, peers=peers)
+
+
 def build_balance_sheet(
-    facts: dict,
+    facts: FactsInput,
     *,
     period: str = "annual",
-    peers: Optional[Iterable[dict]] = None,
+    peers: Optional[Iterable[FactsInput]] = None,
 ) -> List[CommonSizeLine]:
-    lines = _build_lines(
-        facts,
-        _BALANCE_LAYOUT,
-        period=period,
-        denominator_index=0,
-    )
-    _apply_balance_derivations(lines)
-    if lines[0].value is None or lines[0].value == 0:
-        raise StatementNotAvailableError("Total assets not available for common size computation.")
-    _compute_common_size(lines, denominator_index=0)
-    if peers:
-        _apply_industry_average(
-            lines,
-            peers,
-            layout=_BALANCE_LAYOUT,
-            denominator_index=0,
-            period=period,
-            derive_fn=_apply_balance_derivations,
-        )
-    return lines
+    return build_statement(facts, BALANCE_LAYOUT, period=period, peers=peers)
+
+
+def build_income_statements(
+    facts_list: Iterable[FactsInput],
+    *,
+    period: str = "annual",
+) -> StatementBatch:
+    """Build income statements for many companies in one call."""
+
+    return _build_batch(facts_list, INCOME_LAYOUT, period=period)
+
+
+def build_balance_sheets(
+    facts_list: Iterable[FactsInput],
+    *,
+    period: str = "annual",
+) -> StatementBatch:
+    """Build balance sheets for many companies in one call."""
+
+    return _build_batch(facts_list, BALANCE_LAYOUT, period=period)
+
+
+def build_income_statement_series(
+    facts: FactsInput,
+    *,
+    period: str = "annual",
+    periods: int = 5,
+) -> StatementSeries:
+    """Build the income statement for the latest ``periods`` fiscal periods."""
+
+    return _build_series(facts, INCOME_LAYOUT, period=period, periods=periods)
+
+
+def build_balance_sheet_series(
+    facts: FactsInput,
+    *,
+    period: str = "annual",
+    periods: int = 5,
+) -> StatementSeries:
+    """Build the balance sheet for the latest ``periods`` fiscal periods."""
+
+    return _build_series(facts, BALANCE_LAYOUT, period=period, periods=periods)
@@ -0,0 +1,98 @@
+"""Shared SQLite connections for the Commonize cache database.
+
+The industry benchmark cache, the benchmark job queue and the CIK -> SIC store
+all live in one SQLite file that is read by the web app while workers write to
+it.  Every thread keeps one long-lived connection per database file, opened in
+WAL mode so readers never wait for a writer, and each schema is applied once
+per process rather than on every call.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Set, Tuple, Union
+
+SchemaSetup = Callable[[sqlite3.Connection], None]
+
+# Milliseconds a connection waits for a competing writer before giving up.
+_BUSY_TIMEOUT_MS = int(os.environ.get("COMMONIZE_SQLITE_BUSY_TIMEOUT", 30_000))
+
+
+class _ThreadConnections(threading.local):
+    def __init__(self) -> None:
+        self.pid = os.getpid()
+        self.connections: Dict[str, sqlite3.Connection] = {}
+
+
+_local = _ThreadConnections()
+_schemas_ready: Set[Tuple[str, SchemaSetup]] = set()
+_schema_lock = threading.Lock()
+
+
+def _open(path: str) -> sqlite3.Connection:
+    # ``isolation_level=None`` leaves transaction control to :func:`transaction`,
+    # so plain reads never hold a transaction open between calls.
+    conn = sqlite3.connect(path, timeout=_BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+    conn.execute(f"PRAGMA busy_timeout = {_BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+
+def connect(path: Union[str, Path], schema: SchemaSetup | None = None) -> sqlite3.Connection:
+    """Return the calling thread's connection to ``path``.
+
+    ``schema`` is run in its own transaction the first time it is requested
+    for ``path`` in this process, so threads opening their first connection
+    do not queue behind a writer just to repeat the DDL.  Connections
+    inherited across ``fork`` are discarded.
+    """
+
+    if _local.pid != os.getpid():
+        _local.pid = os.getpid()
+        _local.connections = {}
+
+    key = str(path)
+    conn = _local.connections.get(key)
+    if conn is None:
+        conn = _local.connections[key] = _open(key)
+
+    if schema is not None and (key, schema) not in _schemas_ready:
+        with _schema_lock:
+            if (key, schema) not in _schemas_ready:
+                with transaction(conn):
+                    schema(conn)
+                _schemas_ready.add((key, schema))
+    return conn
+
+
+@contextmanager
+def transaction(conn: sqlite3.Connection, *, write: bool = True) -> Iterator[sqlite3.Connection]:
+    """Run a block in one transaction, committing on success.
+
+    Write transactions take the database write lock up front (``BEGIN
+    IMMEDIATE``) so they wait on ``busy_timeout`` instead of failing halfway
+    through; read transactions only pin a consistent snapshot.
+    """
+
+    conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def close_thread_connections() -> None:
+    """Close every connection opened by the calling thread."""
+
+    connections, _local.connections = _local.connections, {}
+    for conn in connections.values():
+        conn.close()
+
+
+__all__ = ["close_thread_connections", "connect", "transaction"]
@@ -1,13 +1,18 @@
 """Caching helpers for industry benchmark data."""
 from __future__ import annotations
 
+import atexit
 import json
 import os
 import sqlite3
+import threading
 import time
-from dataclasses import dataclass
+from collections import OrderedDict
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from . import db
 
 _CACHE_DIR = Path(os.environ.get("COMMONIZE_CACHE", "./.commonize-cache"))
 _CACHE_DIR.mkdir(parents=True, exist_ok=True)
@@ -19,6 +24,21 @@ DB_PATH = _DB_PATH
 
 _DEFAULT_TTL_SECONDS = int(os.environ.get("COMMONIZE_INDUSTRY_CACHE_TTL", 60 * 60 * 24 * 7))
 
+# Exposed so the refresh scheduler can tell which benchmarks are about to expire.
+DEFAULT_TTL_SECONDS = _DEFAULT_TTL_SECONDS
+
+# Width of the buckets benchmark request counts are kept in; ``bucket`` holds
+# the epoch second each bucket starts at.
+_REQUEST_BUCKET_SECONDS = 60 * 60
+# Benchmark requests are counted in memory and written to the database at most
+# once per ``_REQUEST_FLUSH_SECONDS`` by a background thread.
+_REQUEST_FLUSH_SECONDS = float(os.environ.get("COMMONIZE_REQUEST_FLUSH_INTERVAL", 60))
+
+# Decoded benchmarks kept in memory, and how long one is served before it is
+# revalidated against the database.
+_MEMO_SIZE = int(os.environ.get("COMMONIZE_BENCHMARK_MEMO_SIZE", 256))
+_MEMO_TTL_SECONDS = float(os.environ.get("COMMONIZE_BENCHMARK_MEMO_TTL", 30))
+
 
 @dataclass
 class IndustryBenchmark:
@@ -28,6 +48,31 @@ class IndustryBenchmark:
     peer_count: int
     line_count: int
     updated_at: float
+    layout_fingerprint: Optional[str] = None
+    complete: bool = True
+    stale: bool = False
+
+    @property
+    def age_seconds(self) -> float:
+        """Seconds since the benchmark was computed."""
+
+        return max(0.0, time.time() - self.updated_at)
+
+
+@dataclass
+class PeerRatios:
+    """Common size ratios of one peer, keyed by layout row key.
+
+    ``accession`` identifies the filing the ratios were computed from, so a
+    refresh can tell which peers need recomputing.  ``available`` is False
+    when the peer's filing lacked the statement denominator.
+    """
+
+    peer_cik: str
+    accession: Optional[str]
+    ratios: Dict[str, Optional[float]]
+    available: bool = True
+    updated_at: float = 0.0
 
 
 def _ensure_schema(conn: sqlite3.Connection) -> None:
@@ -41,10 +86,53 @@ def _ensure_schema(conn: sqlite3.Connection) -> None:
             peer_count INTEGER NOT NULL,
             line_count INTEGER NOT NULL,
             updated_at REAL NOT NULL,
+            layout_fingerprint TEXT,
             PRIMARY KEY (sic, statement, period)
         )
         """
     )
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(industry_benchmarks)")}
+    if "layout_fingerprint" not in columns:
+        conn.execute("ALTER TABLE industry_benchmarks ADD COLUMN layout_fingerprint TEXT")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS industry_benchmark_rows (
+            sic TEXT NOT NULL,
+            statement TEXT NOT NULL,
+            period TEXT NOT NULL,
+            row_key TEXT NOT NULL,
+            ratio REAL,
+            PRIMARY KEY (sic, statement, period, row_key)
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS industry_peer_ratios (
+            sic TEXT NOT NULL,
+            statement TEXT NOT NULL,
+            period TEXT NOT NULL,
+            peer_cik TEXT NOT NULL,
+            accession TEXT,
+            ratios TEXT NOT NULL,
+            available INTEGER NOT NULL,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (sic, statement, period, peer_cik)
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS benchmark_requests (
+            sic TEXT NOT NULL,
+            statement TEXT NOT NULL,
+            period TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            requests INTEGER NOT NULL,
+            PRIMARY KEY (sic, statement, period, bucket)
+        )
+        """
+    )
 
 
 def ensure_cache_schema(conn: sqlite3.Connection) -> None:
@@ -52,42 +140,120 @@ def ensure_cache_schema(conn: sqlite3.Connection) -> None:
 
     _ensure_schema(conn)
 
-def load_benchmark(
-    sic: Optional[str],
+
+def _connect() -> sqlite3.Connection:
+    return db.connect(_DB_PATH, _ensure_schema)
+
+
+class _BenchmarkMemo:
+    """Bounded LRU of decoded benchmarks shared by the threads of a process.
+
+    Entries younger than ``ttl`` seconds are served without touching the
+    database.  Older entries are revalidated by comparing their
+    ``updated_at`` with the stored row, which picks up benchmarks written by
+    other processes without decoding the ratios again.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[tuple, Tuple[IndustryBenchmark, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Tuple[Optional[IndustryBenchmark], bool]:
+        """Return ``(benchmark, fresh)`` for ``key``; ``fresh`` skips revalidation."""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, False
+            self._entries.move_to_end(key)
+            benchmark, checked_at = entry
+            return benchmark, time.monotonic() - checked_at < self.ttl
+
+    def put(self, key: tuple, benchmark: IndustryBenchmark) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (benchmark, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, sic: str, statement: str, period: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[:3] == (sic, statement, period)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_benchmark_memo = _BenchmarkMemo(_MEMO_SIZE, _MEMO_TTL_SECONDS)
+
+
+def _stored_updated_at(sic: str, statement: str, period: str) -> Optional[float]:
+    with db.transaction(_connect(), write=False) as conn:
+        row = conn.execute(
+            """
+            SELECT updated_at FROM industry_benchmarks
+            WHERE sic = ? AND statement = ? AND period = ?
+            """,
+            (sic, statement, period),
+        ).fetchone()
+    return None if row is None else float(row[0])
+
+
+def _read_benchmark(
+    sic: str,
     statement: str,
     period: str,
     *,
-    expected_line_count: Optional[int] = None,
-    max_age_seconds: Optional[int] = None,
+    expected_line_count: Optional[int],
+    row_keys: Optional[Sequence[str]],
+    layout_fingerprint: Optional[str],
 ) -> Optional[IndustryBenchmark]:
-    """Return a cached benchmark for ``sic`` if it is still valid."""
-
-    if not sic:
-        return None
-    if max_age_seconds is None:
-        max_age_seconds = _DEFAULT_TTL_SECONDS
-
-    with sqlite3.connect(_DB_PATH) as conn:
-        _ensure_schema(conn)
+    with db.transaction(_connect(), write=False) as conn:
         row = conn.execute(
             """
-            SELECT ratios, peer_count, line_count, updated_at
+            SELECT ratios, peer_count, line_count, updated_at, layout_fingerprint
             FROM industry_benchmarks
             WHERE sic = ? AND statement = ? AND period = ?
             """,
             (sic, statement, period),
         ).fetchone()
+        keyed_rows = []
+        if row and row_keys is not None:
+            keyed_rows = conn.execute(
+                """
+                SELECT row_key, ratio FROM industry_benchmark_rows
+                WHERE sic = ? AND statement = ? AND period = ?
+                """,
+                (sic, statement, period),
+            ).fetchall()
 
     if not row:
         return None
 
-    ratios_json, peer_count, line_count, updated_at = row
-    if expected_line_count is not None and line_count != expected_line_count:
-        return None
-    if max_age_seconds and max_age_seconds > 0:
-        if time.time() - updated_at > max_age_seconds:
+    ratios_json, peer_count, line_count, updated_at, stored_fingerprint = row
+
+    if row_keys is not None:
+        stored: Dict[str, Optional[float]] = dict(keyed_rows)
+        if not any(key in stored for key in row_keys):
             return None
+        return IndustryBenchmark(
+            ratios=[stored.get(key) for key in row_keys],
+            peer_count=int(peer_count),
+            line_count=len(row_keys),
+            updated_at=float(updated_at),
+            layout_fingerprint=stored_fingerprint,
+            complete=all(key in stored for key in row_keys)
+            and (layout_fingerprint is None or layout_fingerprint == stored_fingerprint),
+        )
 
+    if expected_line_count is not None and line_count != expected_line_count:
+        return None
     ratios = json.loads(ratios_json)
     # Ensure ratios length matches expected when provided
     if expected_line_count is not None and len(ratios) != expected_line_count:
@@ -98,7 +264,78 @@ def load_benchmark(
         peer_count=int(peer_count),
         line_count=int(line_count),
         updated_at=float(updated_at),
+        layout_fingerprint=stored_fingerprint,
+    )
+
+
+def load_benchmark(
+    sic: Optional[str],
+    statement: str,
+    period: str,
+    *,
+    expected_line_count: Optional[int] = None,
+    max_age_seconds: Optional[int] = None,
+    row_keys: Optional[Sequence[str]] = None,
+    layout_fingerprint: Optional[str] = None,
+    allow_stale: bool = False,
+) -> Optional[IndustryBenchmark]:
+    """Return a cached benchmark for ``sic`` if it is still valid.
+
+    When ``row_keys`` (see ``CompiledLayout.row_keys``) are given, ratios are
+    matched row by row, so rows whose definition is unchanged survive layout
+    edits.  Rows without a stored ratio come back as ``None`` and the result
+    is flagged as incomplete, as it is when ``layout_fingerprint`` differs
+    from the layout the benchmark was computed with.  Without ``row_keys``
+    the ratios are returned positionally and validated by
+    ``expected_line_count``.
+
+    Benchmarks older than ``max_age_seconds`` are treated as missing unless
+    ``allow_stale`` is set, in which case they are returned flagged as
+    ``stale`` so the caller can serve them while a refresh runs.
+
+    Decoded benchmarks are kept in an in-process LRU (see
+    ``COMMONIZE_BENCHMARK_MEMO_SIZE`` and ``COMMONIZE_BENCHMARK_MEMO_TTL``).
+    """
+
+    if not sic:
+        return None
+    if max_age_seconds is None:
+        max_age_seconds = _DEFAULT_TTL_SECONDS
+
+    key = (
+        sic,
+        statement,
+        period,
+        expected_line_count,
+        None if row_keys is None else tuple(row_keys),
+        layout_fingerprint,
     )
+    benchmark, fresh = _benchmark_memo.get(key)
+    if benchmark is not None and not fresh:
+        if _stored_updated_at(sic, statement, period) == benchmark.updated_at:
+            _benchmark_memo.put(key, benchmark)
+        else:
+            benchmark = None
+    if benchmark is None:
+        benchmark = _read_benchmark(
+            sic,
+            statement,
+            period,
+            expected_line_count=expected_line_count,
+            row_keys=row_keys,
+            layout_fingerprint=layout_fingerprint,
+        )
+        if benchmark is None:
+            return None
+        _benchmark_memo.put(key, benchmark)
+
+    stale = False
+    if max_age_seconds and max_age_seconds > 0:
+        if time.time() - benchmark.updated_at > max_age_seconds:
+            if not allow_stale:
+                return None
+            stale = True
+    return replace(benchmark, ratios=list(benchmark.ratios), stale=stale)
 
 
 def store_benchmark(
@@ -109,8 +346,14 @@ def store_benchmark(
     peer_count: int,
     *,
     line_count: int,
+    row_keys: Optional[Sequence[str]] = None,
+    layout_fingerprint: Optional[str] = None,
 ) -> None:
-    """Persist ``ratios`` for the given industry if possible."""
+    """Persist ``ratios`` for the given industry if possible.
+
+    ``row_keys`` stores each ratio under its row key as well, which lets
+    :func:`load_benchmark` reuse unchanged rows after a layout edit.
+    """
 
     if not sic:
         return
@@ -120,24 +363,229 @@ def store_benchmark(
         return
     if len(ratios_list) != line_count:
         raise ValueError("Line count mismatch when storing industry benchmark")
+    if row_keys is not None and len(row_keys) != line_count:
+        raise ValueError("Row key count mismatch when storing industry benchmark")
 
     timestamp = time.time()
     payload = json.dumps(ratios_list)
 
-    with sqlite3.connect(_DB_PATH) as conn:
-        _ensure_schema(conn)
+    with db.transaction(_connect()) as conn:
         conn.execute(
             """
             INSERT INTO industry_benchmarks (
-                sic, statement, period, ratios, peer_count, line_count, updated_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+                sic, statement, period, ratios, peer_count, line_count, updated_at,
+                layout_fingerprint
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             ON CONFLICT(sic, statement, period)
             DO UPDATE SET
                 ratios = excluded.ratios,
                 peer_count = excluded.peer_count,
                 line_count = excluded.line_count,
-                updated_at = excluded.updated_at
+                updated_at = excluded.updated_at,
+                layout_fingerprint = excluded.layout_fingerprint
+            """,
+            (
+                sic,
+                statement,
+                period,
+                payload,
+                int(peer_count),
+                int(line_count),
+                timestamp,
+                layout_fingerprint,
+            ),
+        )
+        conn.execute(
+            """
+            DELETE FROM industry_benchmark_rows
+            WHERE sic = ? AND statement = ? AND period = ?
+            """,
+            (sic, statement, period),
+        )
+        if row_keys is not None:
+            conn.executemany(
+                """
+                INSERT INTO industry_benchmark_rows (sic, statement, period, row_key, ratio)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                [
+                    (sic, statement, period, key, ratio)
+                    for key, ratio in zip(row_keys, ratios_list)
+                ],
+            )
+    _benchmark_memo.invalidate(sic, statement, period)
+
+
+def load_peer_ratios(sic: Optional[str], statement: str, period: str) -> Dict[str, PeerRatios]:
+    """Return the stored per-peer ratios for an industry, keyed by peer CIK."""
+
+    if not sic:
+        return {}
+
+    with db.transaction(_connect(), write=False) as conn:
+        rows = conn.execute(
+            """
+            SELECT peer_cik, accession, ratios, available, updated_at
+            FROM industry_peer_ratios
+            WHERE sic = ? AND statement = ? AND period = ?
+            """,
+            (sic, statement, period),
+        ).fetchall()
+
+    return {
+        peer_cik: PeerRatios(
+            peer_cik=peer_cik,
+            accession=accession,
+            ratios=json.loads(ratios_json),
+            available=bool(available),
+            updated_at=float(updated_at),
+        )
+        for peer_cik, accession, ratios_json, available, updated_at in rows
+    }
+
+
+def store_peer_ratios(
+    sic: Optional[str],
+    statement: str,
+    period: str,
+    peers: Iterable[PeerRatios],
+) -> None:
+    """Replace the stored per-peer ratios for an industry with ``peers``.
+
+    Peers that are no longer part of the industry sample are removed, so the
+    stored rows always describe the peers behind the aggregate benchmark.
+    """
+
+    if not sic:
+        return
+
+    timestamp = time.time()
+    rows = [
+        (
+            sic,
+            statement,
+            period,
+            peer.peer_cik,
+            peer.accession,
+            json.dumps(peer.ratios),
+            int(peer.available),
+            peer.updated_at or timestamp,
+        )
+        for peer in peers
+    ]
+
+    with db.transaction(_connect()) as conn:
+        conn.execute(
+            """
+            DELETE FROM industry_peer_ratios
+            WHERE sic = ? AND statement = ? AND period = ?
+            """,
+            (sic, statement, period),
+        )
+        conn.executemany(
+            """
+            INSERT INTO industry_peer_ratios (
+                sic, statement, period, peer_cik, accession, ratios, available, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             """,
-            (sic, statement, period, payload, int(peer_count), int(line_count), timestamp),
+            rows,
         )
-        conn.commit()
+
+
+class _RequestCounter:
+    """In-process tally of benchmark requests, flushed to the database in batches.
+
+    Counting never touches the database, so page views neither take the write
+    lock nor fail when it is busy.  Once ``interval`` seconds have passed
+    since the last flush, the next request starts a background thread that
+    writes the tally; counts it fails to write are kept for the next flush.
+    """
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._counts: Dict[Tuple[str, str, str, int], int] = {}
+        self._lock = threading.Lock()
+        self._flushing = False
+        self._flushed_at = time.monotonic()
+
+    def add(self, sic: str, statement: str, period: str) -> None:
+        bucket = int(time.time() // _REQUEST_BUCKET_SECONDS) * _REQUEST_BUCKET_SECONDS
+        key = (sic, statement, period, bucket)
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + 1
+            if self._flushing or time.monotonic() - self._flushed_at < self.interval:
+                return
+            self._flushing = True
+        threading.Thread(target=self._flush_in_background, daemon=True).start()
+
+    def _flush_in_background(self) -> None:
+        try:
+            self.flush()
+        except sqlite3.Error:
+            pass  # counts are kept and written by the next flush
+        finally:
+            db.close_thread_connections()
+
+    def flush(self) -> None:
+        with self._lock:
+            counts, self._counts = self._counts, {}
+            self._flushing = True
+        try:
+            if counts:
+                with db.transaction(_connect()) as conn:
+                    conn.executemany(
+                        """
+                        INSERT INTO benchmark_requests (sic, statement, period, bucket, requests)
+                        VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT(sic, statement, period, bucket)
+                        DO UPDATE SET requests = requests + excluded.requests
+                        """,
+                        [key + (count,) for key, count in counts.items()],
+                    )
+        except BaseException:
+            with self._lock:
+                for key, count in counts.items():
+                    self._counts[key] = self._counts.get(key, 0) + count
+            raise
+        finally:
+            with self._lock:
+                self._flushing = False
+                self._flushed_at = time.monotonic()
+
+
+_request_counter = _RequestCounter(_REQUEST_FLUSH_SECONDS)
+
+
+@atexit.register
+def _flush_requests_at_exit() -> None:
+    try:
+        _request_counter.flush()
+    except sqlite3.Error:  # pragma: no cover - counts are best effort
+        pass
+
+
+def record_benchmark_request(sic: Optional[str], statement: str, period: str) -> None:
+    """Count a request for a benchmark so popular industries are refreshed first.
+
+    Counts are kept in memory and written in batches (see
+    ``COMMONIZE_REQUEST_FLUSH_INTERVAL``); :func:`flush_benchmark_requests`
+    writes them straight away.
+    """
+
+    if not sic:
+        return
+    _request_counter.add(sic, statement, period)
+
+
+def flush_benchmark_requests() -> None:
+    """Write the request counts recorded by this process to the database."""
+
+    _request_counter.flush()
+
+
+def prune_benchmark_requests(max_age_seconds: float) -> None:
+    """Drop request counts older than ``max_age_seconds``."""
+
+    cutoff = time.time() - max_age_seconds - _REQUEST_BUCKET_SECONDS
+    with db.transaction(_connect()) as conn:
+        conn.execute("DELETE FROM benchmark_requests WHERE bucket < ?", (cutoff,))
@@ -1,31 +1,88 @@
 """Background job orchestration for computing industry benchmarks."""
 from __future__ import annotations
 
+import logging
+import math
+import os
+import random
+import socket
 import sqlite3
 import threading
 import time
 from dataclasses import dataclass
-from typing import Callable, Dict, Optional
+from typing import Dict, List, Optional, Sequence, Tuple
 
+from . import db
 from .common_size import (
-    CommonSizeLine,
-    StatementNotAvailableError,
-    build_balance_sheet,
-    build_income_statement,
+    BALANCE_LAYOUT,
+    INCOME_LAYOUT,
+    LAYOUT_TAGS,
+    CompiledLayout,
+    build_statement_batch,
+    statement_accession,
+    summarize_peer_ratios,
+)
+from .industry_cache import (
+    DB_PATH,
+    DEFAULT_TTL_SECONDS,
+    PeerRatios,
+    ensure_cache_schema,
+    flush_benchmark_requests,
+    load_benchmark,
+    load_peer_ratios,
+    prune_benchmark_requests,
+    store_benchmark,
+    store_peer_ratios,
 )
-from .industry_cache import DB_PATH, ensure_cache_schema, load_benchmark, store_benchmark
 from .sec_client import (
     SECClientError,
+    FactIndex,
     IndustryInfo,
     TickerInfo,
-    fetch_company_facts,
     fetch_peer_company_facts,
+    index_facts,
 )
 
+logger = logging.getLogger(__name__)
+
+# Idle workers first look for database changes after this many seconds,
+# doubling the wait up to the maximum while nothing changes.
+_MIN_IDLE_WAIT = 0.01
+_MAX_IDLE_WAIT = 0.5
+
+# Notified by ``enqueue_benchmark_job`` so idle workers in this process wake at once.
+_wakeup = threading.Condition()
+
+# Seconds a claimed job stays leased to its worker without a heartbeat.
+_LEASE_SECONDS = float(os.environ.get("COMMONIZE_JOB_LEASE_SECONDS", 120))
+
+# Queue lanes, most urgent first.  Workers claim the most urgent pending job,
+# and a job waiting longer than ``COMMONIZE_JOB_PRIORITY_AGING`` seconds is
+# promoted one lane so bulk refreshes cannot starve forever.  Aging stops at
+# the CLI lane: the interactive lane is reserved for users waiting on a page.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_CLI = 1
+PRIORITY_BACKGROUND = 2
+_PRIORITY_AGING_SECONDS = float(os.environ.get("COMMONIZE_JOB_PRIORITY_AGING", 60))
+
+# The refresh scheduler wakes every ``_REFRESH_INTERVAL`` seconds and requeues
+# at most ``_REFRESH_BATCH`` benchmarks that expire within ``_REFRESH_HORIZON``
+# seconds and were requested during the last ``_REFRESH_WINDOW`` seconds.
+_REFRESH_INTERVAL = float(os.environ.get("COMMONIZE_REFRESH_INTERVAL", 5 * 60))
+_REFRESH_HORIZON = float(os.environ.get("COMMONIZE_REFRESH_HORIZON", 60 * 60 * 24))
+_REFRESH_BATCH = int(os.environ.get("COMMONIZE_REFRESH_BATCH", 10))
+_REFRESH_WINDOW = float(os.environ.get("COMMONIZE_REFRESH_WINDOW", 60 * 60 * 24 * 7))
+
+# Exposed so the worker command line can show the scheduler's default interval.
+DEFAULT_REFRESH_INTERVAL = _REFRESH_INTERVAL
 
-_JOB_STATEMENTS: Dict[str, Callable[..., list[CommonSizeLine]]] = {
-    "income": build_income_statement,
-    "balance": build_balance_sheet,
+# Seconds a failed refresh is left alone before a page view or the refresh
+# scheduler may queue it again.
+FAILED_REFRESH_COOLDOWN = float(os.environ.get("COMMONIZE_FAILED_REFRESH_COOLDOWN", 60 * 60))
+
+_JOB_LAYOUTS: Dict[str, CompiledLayout] = {
+    "income": INCOME_LAYOUT,
+    "balance": BALANCE_LAYOUT,
 }
 
 
@@ -46,6 +103,83 @@ class BenchmarkJob:
     finished_at: Optional[float]
     attempts: int
     error: Optional[str]
+    worker_id: Optional[str] = None
+    lease_expires_at: Optional[float] = None
+    heartbeat_at: Optional[float] = None
+    priority: int = PRIORITY_BACKGROUND
+    not_before: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How often, and how patiently, a class of failure is retried."""
+
+    base_delay: float
+    max_delay: float
+    max_attempts: int
+
+    def delay(self, attempts: int) -> float:
+        """Return a jittered exponential delay before retry number ``attempts``."""
+
+        ceiling = min(self.max_delay, self.base_delay * 2 ** max(0, attempts - 1))
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+# SEC throttling (429) backs off longer and is retried more patiently than
+# other transient failures, since it clears only once the shared budget
+# recovers.  SEC outages, network errors and a busy cache database use
+# ``TRANSIENT_RETRY``.  Anything else, such as an unknown CIK, fails for good
+# on the first attempt.
+THROTTLE_RETRY = RetryPolicy(
+    base_delay=float(os.environ.get("COMMONIZE_JOB_THROTTLE_RETRY_BASE", 120)),
+    max_delay=float(os.environ.get("COMMONIZE_JOB_THROTTLE_RETRY_MAX", 60 * 60 * 2)),
+    max_attempts=int(os.environ.get("COMMONIZE_JOB_THROTTLE_MAX_ATTEMPTS", 8)),
+)
+
+TRANSIENT_RETRY = RetryPolicy(
+    base_delay=float(os.environ.get("COMMONIZE_JOB_RETRY_BASE", 30)),
+    max_delay=float(os.environ.get("COMMONIZE_JOB_RETRY_MAX", 60 * 60)),
+    max_attempts=int(os.environ.get("COMMONIZE_JOB_MAX_ATTEMPTS", 5)),
+)
+
+
+def _retry_policy(exc: Exception) -> Optional[RetryPolicy]:
+    if isinstance(exc, SECClientError) and exc.status_code == 429:
+        return THROTTLE_RETRY
+    if isinstance(exc, SECClientError) and exc.retryable:
+        return TRANSIENT_RETRY
+    # A busy or locked cache database clears up on its own.
+    if isinstance(exc, sqlite3.OperationalError):
+        return TRANSIENT_RETRY
+    return None
+
+
+# Columns read into ``BenchmarkJob``, in field order.
+_JOB_COLUMNS = """
+    sic, statement, period, max_companies, subject_cik,
+    subject_ticker, subject_title, status, queued_at,
+    started_at, finished_at, attempts, error,
+    worker_id, lease_expires_at, heartbeat_at, priority, not_before
+"""
+
+_JOB_FIELDS = [name.strip() for name in _JOB_COLUMNS.split(",")]
+
+# Jobs a worker may claim: pending ones that are not backing off after a
+# failure, and running ones whose lease lapsed.
+_CLAIMABLE = """
+    (status = 'pending' AND COALESCE(not_before, 0) <= :now)
+    OR (status = 'running' AND COALESCE(lease_expires_at, 0) < :now)
+"""
+
+# Columns added to ``benchmark_jobs`` after its first release.
+_JOB_MIGRATIONS = {
+    "worker_id": "TEXT",
+    "lease_expires_at": "REAL",
+    "heartbeat_at": "REAL",
+    "priority": f"INTEGER NOT NULL DEFAULT {PRIORITY_BACKGROUND}",
+    "promoted_at": "REAL",
+    "not_before": "REAL",
+}
 
 
 def _ensure_job_schema(conn: sqlite3.Connection) -> None:
@@ -66,16 +200,30 @@ def _ensure_job_schema(conn: sqlite3.Connection) -> None:
             finished_at REAL,
             attempts INTEGER NOT NULL DEFAULT 0,
             error TEXT,
+            worker_id TEXT,
+            lease_expires_at REAL,
+            heartbeat_at REAL,
+            priority INTEGER NOT NULL DEFAULT 2,
+            promoted_at REAL,
+            not_before REAL,
             PRIMARY KEY (sic, statement, period)
         )
         """
     )
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(benchmark_jobs)")}
+    for column, definition in _JOB_MIGRATIONS.items():
+        if column not in columns:
+            conn.execute(f"ALTER TABLE benchmark_jobs ADD COLUMN {column} {definition}")
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS benchmark_jobs_by_priority
+        ON benchmark_jobs (status, priority, queued_at)
+        """
+    )
 
 
 def _connect() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
-    _ensure_job_schema(conn)
-    return conn
+    return db.connect(DB_PATH, _ensure_job_schema)
 
 
 def enqueue_benchmark_job(
@@ -86,8 +234,15 @@ def enqueue_benchmark_job(
     *,
     max_companies: int,
     force: bool = False,
+    priority: int = PRIORITY_BACKGROUND,
 ) -> None:
-    """Persist a benchmark job if one is not already queued."""
+    """Persist a benchmark job if one is not already queued.
+
+    ``priority`` picks the queue lane.  Enqueueing a job that is already
+    pending moves it to the more urgent of its current lane and ``priority``,
+    even with ``force``, and keeps its place in that lane.  ``force`` requeues
+    jobs that succeeded or failed.
+    """
 
     if not industry.sic:
         return
@@ -103,28 +258,36 @@ def enqueue_benchmark_job(
         subject.title,
     )
 
-    with _connect() as conn:
+    queued = False
+    with db.transaction(_connect()) as conn:
         row = conn.execute(
             """
-            SELECT status FROM benchmark_jobs
+            SELECT status, priority FROM benchmark_jobs
             WHERE sic = ? AND statement = ? AND period = ?
             """,
             (industry.sic, statement, period),
         ).fetchone()
 
         if row:
-            if force and row[0] != "running":
+            status, current_priority = row
+            # Only finished jobs are reset.  Pending and running jobs keep
+            # their attempts and backoff, and dead ones wait for
+            # :func:`requeue_dead_jobs`, so forcing cannot bypass retry limits.
+            if force and status in ("succeeded", "failed"):
                 conn.execute(
                     """
                     UPDATE benchmark_jobs
                     SET status = 'pending', queued_at = ?, started_at = NULL,
                         finished_at = NULL, attempts = 0, error = NULL,
+                        worker_id = NULL, lease_expires_at = NULL, heartbeat_at = NULL,
+                        priority = ?, promoted_at = NULL, not_before = NULL,
                         max_companies = ?, subject_cik = ?,
                         subject_ticker = ?, subject_title = ?
                     WHERE sic = ? AND statement = ? AND period = ?
                     """,
                     (
                         now,
+                        int(priority),
                         int(max_companies),
                         subject.cik,
                         subject.ticker,
@@ -134,31 +297,75 @@ def enqueue_benchmark_job(
                         period,
                     ),
                 )
-                conn.commit()
-            return
+                queued = True
+            elif status == "pending" and priority < current_priority:
+                conn.execute(
+                    """
+                    UPDATE benchmark_jobs SET priority = ?
+                    WHERE sic = ? AND statement = ? AND period = ?
+                    """,
+                    (int(priority), industry.sic, statement, period),
+                )
+                queued = True
+        else:
+            conn.execute(
+                """
+                INSERT INTO benchmark_jobs (
+                    sic, statement, period, max_companies,
+                    subject_cik, subject_ticker, subject_title,
+                    status, queued_at, priority
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, 'pending', ?, ?)
+                """,
+                payload + (now, int(priority)),
+            )
+            queued = True
 
-        conn.execute(
-            """
-            INSERT INTO benchmark_jobs (
-                sic, statement, period, max_companies,
-                subject_cik, subject_ticker, subject_title,
-                status, queued_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, 'pending', ?)
-            """,
-            payload + (now,),
-        )
-        conn.commit()
+    if queued:
+        _notify_workers()
+
+
+def _notify_workers() -> None:
+    with _wakeup:
+        _wakeup.notify_all()
+
+
+def _data_version(conn: sqlite3.Connection) -> int:
+    # Changes whenever another connection, in any process, commits to the database.
+    return conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+def _wait_for_work(stop_event: threading.Event, poll_interval: float, version: int) -> None:
+    """Block until a job may be claimable, ``poll_interval`` passes or ``stop_event`` is set.
+
+    Enqueues in this process wake the worker through ``_wakeup``; commits
+    from other processes are noticed by watching ``PRAGMA data_version``
+    move past ``version``, rechecked after a wait that doubles from
+    ``_MIN_IDLE_WAIT`` to ``_MAX_IDLE_WAIT`` while the database stays
+    unchanged.
+    """
+
+    conn = _connect()
+    deadline = time.monotonic() + poll_interval
+    delay = _MIN_IDLE_WAIT
+    while not stop_event.is_set():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        with _wakeup:
+            if _wakeup.wait(min(delay, remaining)):
+                return
+        if _data_version(conn) != version:
+            return
+        delay = min(delay * 2, _MAX_IDLE_WAIT)
 
 
 def get_job_status(sic: Optional[str], statement: str, period: str) -> Optional[BenchmarkJob]:
     if not sic:
         return None
-    with _connect() as conn:
+    with db.transaction(_connect(), write=False) as conn:
         row = conn.execute(
-            """
-            SELECT sic, statement, period, max_companies, subject_cik,
-                   subject_ticker, subject_title, status, queued_at,
-                   started_at, finished_at, attempts, error
+            f"""
+            SELECT {_JOB_COLUMNS}
             FROM benchmark_jobs
             WHERE sic = ? AND statement = ? AND period = ?
             """,
@@ -173,78 +380,387 @@ def _row_to_job(row: tuple) -> BenchmarkJob:
     return BenchmarkJob(*row)
 
 
-def claim_next_job() -> Optional[BenchmarkJob]:
-    with _connect() as conn:
-        conn.isolation_level = None
-        conn.execute("BEGIN IMMEDIATE")
-        row = conn.execute(
-            """
-            SELECT sic, statement, period, max_companies, subject_cik,
-                   subject_ticker, subject_title, status, queued_at,
-                   started_at, finished_at, attempts, error
+def default_worker_id() -> str:
+    """Return an identifier unique to the calling thread across hosts."""
+
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def _lease(conn: sqlite3.Connection, job: BenchmarkJob, worker_id: str, now: float) -> None:
+    job.status = "running"
+    job.started_at = now
+    job.attempts += 1
+    job.worker_id = worker_id
+    job.heartbeat_at = now
+    job.lease_expires_at = now + _LEASE_SECONDS
+    conn.execute(
+        """
+        UPDATE benchmark_jobs
+        SET status = 'running', started_at = ?, attempts = ?,
+            worker_id = ?, heartbeat_at = ?, lease_expires_at = ?
+        WHERE sic = ? AND statement = ? AND period = ?
+        """,
+        (
+            job.started_at,
+            job.attempts,
+            job.worker_id,
+            job.heartbeat_at,
+            job.lease_expires_at,
+            job.sic,
+            job.statement,
+            job.period,
+        ),
+    )
+
+
+def _promote_waiting_jobs(conn: sqlite3.Connection, now: float) -> None:
+    # Move jobs that waited a full aging period in their lane up one lane, but
+    # never into the interactive lane, where aged bulk work would sort ahead
+    # of a user's page by its older ``queued_at``.
+    conn.execute(
+        """
+        UPDATE benchmark_jobs
+        SET priority = priority - 1, promoted_at = ?
+        WHERE status = 'pending' AND priority > ?
+          AND COALESCE(promoted_at, queued_at) < ?
+        """,
+        (now, PRIORITY_CLI, now - _PRIORITY_AGING_SECONDS),
+    )
+
+
+def _bury_abandoned_jobs(conn: sqlite3.Connection, now: float) -> None:
+    # A job whose lease lapsed after its last allowed attempt killed or hung
+    # every worker that took it, so it is dead-lettered rather than leased again.
+    conn.execute(
+        """
+        UPDATE benchmark_jobs
+        SET status = 'dead', finished_at = ?,
+            error = COALESCE(error, 'Worker lease expired'),
+            worker_id = NULL, lease_expires_at = NULL
+        WHERE status = 'running' AND COALESCE(lease_expires_at, 0) < ?
+          AND attempts >= ?
+        """,
+        (now, now, max(TRANSIENT_RETRY.max_attempts, THROTTLE_RETRY.max_attempts)),
+    )
+
+
+def _next_claimable(conn: sqlite3.Connection, now: float) -> Optional[tuple]:
+    """Return the most urgent claimable job row, oldest first within a lane."""
+
+    _bury_abandoned_jobs(conn, now)
+    _promote_waiting_jobs(conn, now)
+    candidates = [
+        conn.execute(
+            f"""
+            SELECT {_JOB_COLUMNS} FROM benchmark_jobs
+            WHERE status = 'pending' AND COALESCE(not_before, 0) <= ?
+            ORDER BY priority ASC, queued_at ASC
+            LIMIT 1
+            """,
+            (now,),
+        ).fetchone(),
+        conn.execute(
+            f"""
+            SELECT {_JOB_COLUMNS} FROM benchmark_jobs
+            WHERE status = 'running' AND COALESCE(lease_expires_at, 0) < ?
+            ORDER BY priority ASC, queued_at ASC
+            LIMIT 1
+            """,
+            (now,),
+        ).fetchone(),
+    ]
+    candidates = [row for row in candidates if row is not None]
+    if not candidates:
+        return None
+    priority_index = _JOB_FIELDS.index("priority")
+    queued_index = _JOB_FIELDS.index("queued_at")
+    return min(candidates, key=lambda row: (row[priority_index], row[queued_index]))
+
+
+def claim_job_group(worker_id: Optional[str] = None) -> List[BenchmarkJob]:
+    """Lease the most urgent claimable job and every claimable job for the same SIC.
+
+    Jobs are claimable when pending and not backing off after a failure, or
+    when running with an expired lease because their worker died or hung.
+    Siblings share their peers, so the group can be computed from a single
+    peer download (see :func:`process_job_group`).
+    """
+
+    worker_id = worker_id or default_worker_id()
+    now = time.time()
+    conn = _connect()
+    # Look for work with a plain read first so an empty queue never takes the
+    # write lock.
+    claimable = conn.execute(
+        f"SELECT 1 FROM benchmark_jobs WHERE {_CLAIMABLE} LIMIT 1", {"now": now}
+    ).fetchone()
+    if claimable is None:
+        return []
+
+    with db.transaction(conn) as conn:
+        row = _next_claimable(conn, now)
+        if not row:
+            return []
+
+        jobs = [_row_to_job(row)]
+        siblings = conn.execute(
+            f"""
+            SELECT {_JOB_COLUMNS}
             FROM benchmark_jobs
-            WHERE status = 'pending'
+            WHERE sic = :sic AND NOT (statement = :statement AND period = :period)
+              AND ({_CLAIMABLE})
             ORDER BY queued_at ASC
-            LIMIT 1
             """,
-        ).fetchone()
+            {
+                "sic": jobs[0].sic,
+                "statement": jobs[0].statement,
+                "period": jobs[0].period,
+                "now": now,
+            },
+        ).fetchall()
+        jobs.extend(_row_to_job(sibling) for sibling in siblings)
+        for job in jobs:
+            _lease(conn, job, worker_id, now)
+    return jobs
+
+
+def claim_next_job(worker_id: Optional[str] = None) -> Optional[BenchmarkJob]:
+    """Lease the most urgent claimable job to ``worker_id``.
+
+    Running jobs whose lease has expired, because their worker died or hung,
+    are claimed again as if they were pending, unless they already used
+    as many attempts as any retry policy allows; those move to ``dead``.
+    """
+
+    worker_id = worker_id or default_worker_id()
+    now = time.time()
+    with db.transaction(_connect()) as conn:
+        row = _next_claimable(conn, now)
         if not row:
-            conn.execute("COMMIT")
             return None
 
         job = _row_to_job(row)
-        conn.execute(
+        _lease(conn, job, worker_id, now)
+    return job
+
+
+def heartbeat(job: BenchmarkJob) -> bool:
+    """Extend the lease on ``job``; return False if another worker took it over."""
+
+    now = time.time()
+    with db.transaction(_connect()) as conn:
+        cursor = conn.execute(
             """
             UPDATE benchmark_jobs
-            SET status = 'running', started_at = ?, attempts = attempts + 1
+            SET heartbeat_at = ?, lease_expires_at = ?
             WHERE sic = ? AND statement = ? AND period = ?
+              AND status = 'running' AND worker_id IS ?
             """,
-            (time.time(), job.sic, job.statement, job.period),
+            (now, now + _LEASE_SECONDS, job.sic, job.statement, job.period, job.worker_id),
         )
-        conn.execute("COMMIT")
-        job.status = "running"
-    return job
+    if cursor.rowcount:
+        job.heartbeat_at = now
+        job.lease_expires_at = now + _LEASE_SECONDS
+    return bool(cursor.rowcount)
+
+
+class _LeaseKeeper:
+    """Context manager heartbeating job leases from a background thread."""
+
+    def __init__(self, jobs: Sequence[BenchmarkJob], interval: float) -> None:
+        self.jobs = list(jobs)
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        try:
+            while self.jobs and not self._stop.wait(self.interval):
+                try:
+                    self.jobs = [job for job in self.jobs if heartbeat(job)]
+                except sqlite3.Error:
+                    # Try again next interval; the lease outlives a few misses.
+                    logger.exception("Could not renew benchmark job leases")
+        finally:
+            db.close_thread_connections()
+
+    def __enter__(self) -> "_LeaseKeeper":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self._stop.set()
+        self._thread.join()
 
 
 def _complete_job(job: BenchmarkJob, status: str, error: Optional[str] = None) -> None:
-    with _connect() as conn:
+    # Only the worker holding the lease may finish the job, so a worker that
+    # lost its lease cannot overwrite the result of the one that reclaimed it,
+    # and only once, so a failing sibling cannot undo a finished job.
+    with db.transaction(_connect()) as conn:
         conn.execute(
             """
             UPDATE benchmark_jobs
-            SET status = ?, finished_at = ?, error = ?
-            WHERE sic = ? AND statement = ? AND period = ?
+            SET status = ?, finished_at = ?, error = ?, lease_expires_at = NULL
+            WHERE sic = ? AND statement = ? AND period = ? AND worker_id IS ?
+              AND status = 'running'
             """,
-            (status, time.time(), error, job.sic, job.statement, job.period),
+            (status, time.time(), error, job.sic, job.statement, job.period, job.worker_id),
         )
-        conn.commit()
 
 
-def process_job(job: BenchmarkJob) -> None:
-    builder = _JOB_STATEMENTS.get(job.statement)
-    if builder is None:
-        _complete_job(job, "failed", f"Unknown statement '{job.statement}'")
+def _fail_job(job: BenchmarkJob, error: str, policy: Optional[RetryPolicy] = None) -> None:
+    """Record a failed attempt, scheduling a retry when ``policy`` allows one.
+
+    Jobs without a policy fail for good.  Jobs that used up
+    ``policy.max_attempts`` move to the ``dead`` state, where they stay until
+    :func:`requeue_dead_jobs` is called.
+    """
+
+    if policy is None:
+        _complete_job(job, "failed", error)
+        return
+    if job.attempts >= policy.max_attempts:
+        _complete_job(job, "dead", error)
         return
 
-    try:
-        facts = fetch_company_facts(job.subject_cik)
-        industry_info, peers, peer_facts = fetch_peer_company_facts(
-            job.subject_cik, max_companies=job.max_companies
+    now = time.time()
+    with db.transaction(_connect()) as conn:
+        conn.execute(
+            """
+            UPDATE benchmark_jobs
+            SET status = 'pending', not_before = ?, finished_at = ?, error = ?,
+                worker_id = NULL, lease_expires_at = NULL
+            WHERE sic = ? AND statement = ? AND period = ? AND worker_id IS ?
+              AND status = 'running'
+            """,
+            (
+                now + policy.delay(job.attempts),
+                now,
+                error,
+                job.sic,
+                job.statement,
+                job.period,
+                job.worker_id,
+            ),
         )
-    except (SECClientError, KeyError) as exc:
-        _complete_job(job, "failed", str(exc))
-        return
 
-    if not peer_facts:
-        _complete_job(job, "failed", "No peer filings available")
-        return
 
-    try:
-        lines = builder(facts, period=job.period, peers=peer_facts)
-    except StatementNotAvailableError as exc:
-        _complete_job(job, "failed", str(exc))
+def _fail_jobs(jobs: Sequence[BenchmarkJob], exc: Exception) -> None:
+    # Called with jobs in an unknown state; a job that cannot be recorded
+    # keeps its lease until it expires and another worker reclaims it.
+    for job in jobs:
+        try:
+            _fail_job(job, str(exc) or type(exc).__name__, _retry_policy(exc))
+        except sqlite3.Error:
+            logger.exception("Could not record failure of benchmark job for SIC %s", job.sic)
+
+
+def list_dead_jobs() -> List[BenchmarkJob]:
+    """Return the jobs that exhausted their retries, oldest first."""
+
+    with db.transaction(_connect(), write=False) as conn:
+        rows = conn.execute(
+            f"""
+            SELECT {_JOB_COLUMNS} FROM benchmark_jobs
+            WHERE status = 'dead'
+            ORDER BY finished_at ASC
+            """
+        ).fetchall()
+    return [_row_to_job(row) for row in rows]
+
+
+def requeue_dead_jobs(sic: Optional[str] = None) -> int:
+    """Move dead jobs (only those for ``sic`` when given) back to the queue."""
+
+    query = """
+        UPDATE benchmark_jobs
+        SET status = 'pending', queued_at = ?, attempts = 0, not_before = NULL,
+            started_at = NULL, finished_at = NULL, error = NULL,
+            worker_id = NULL, lease_expires_at = NULL
+        WHERE status = 'dead'
+    """
+    params: list = [time.time()]
+    if sic is not None:
+        query += " AND sic = ?"
+        params.append(sic)
+    with db.transaction(_connect()) as conn:
+        count = conn.execute(query, params).rowcount
+    if count:
+        _notify_workers()
+    return count
+
+
+def _peer_ratios(
+    peers: Sequence[TickerInfo],
+    peer_facts: Sequence[FactIndex],
+    layout: CompiledLayout,
+    *,
+    period: str,
+    stored: Dict[str, PeerRatios],
+) -> List[PeerRatios]:
+    """Return ratios for every peer, recomputing only peers with new filings."""
+
+    results: Dict[str, PeerRatios] = {}
+    changed: List[Tuple[TickerInfo, Optional[str], FactIndex]] = []
+    for peer, facts in zip(peers, peer_facts):
+        index = index_facts(facts)
+        accession = statement_accession(index, layout, period=period)
+        previous = stored.get(peer.cik)
+        if (
+            previous is not None
+            and accession is not None
+            and previous.accession == accession
+            and all(key in previous.ratios for key in layout.row_keys)
+        ):
+            results[peer.cik] = previous
+        else:
+            changed.append((peer, accession, index))
+
+    if changed:
+        batch = build_statement_batch(
+            [index for _, _, index in changed], layout, period=period
+        )
+        for row, (peer, accession, _) in enumerate(changed):
+            results[peer.cik] = PeerRatios(
+                peer_cik=peer.cik,
+                accession=accession,
+                ratios={
+                    key: None if math.isnan(ratio) else float(ratio)
+                    for key, ratio in zip(layout.row_keys, batch.ratios[row])
+                },
+                available=bool(batch.available[row]),
+            )
+    return [results[peer.cik] for peer in peers]
+
+
+def _store_job_benchmark(
+    job: BenchmarkJob,
+    industry_info: IndustryInfo,
+    peers: Sequence[TickerInfo],
+    peer_facts: Sequence[FactIndex],
+) -> None:
+    layout = _JOB_LAYOUTS.get(job.statement)
+    if layout is None:
+        _complete_job(job, "failed", f"Unknown statement '{job.statement}'")
         return
 
-    ratios = [line.industry_common_size for line in lines]
+    peers = peers[: job.max_companies]
+    peer_facts = peer_facts[: job.max_companies]
+    stored = load_peer_ratios(industry_info.sic, job.statement, job.period)
+    peer_ratios = _peer_ratios(peers, peer_facts, layout, period=job.period, stored=stored)
+    store_peer_ratios(industry_info.sic, job.statement, job.period, peer_ratios)
+
+    matrix = [
+        [peer.ratios.get(key) for key in layout.row_keys]
+        for peer in peer_ratios
+        if peer.available
+    ]
+    ratios: List[Optional[float]] = [None] * len(layout)
+    for index, stats in enumerate(summarize_peer_ratios(matrix)):
+        if stats.count:
+            ratios[index] = stats.mean
+
     try:
         store_benchmark(
             industry_info.sic,
@@ -252,7 +768,9 @@ def process_job(job: BenchmarkJob) -> None:
             job.period,
             ratios,
             len(peers),
-            line_count=len(lines),
+            line_count=len(layout),
+            row_keys=layout.row_keys,
+            layout_fingerprint=layout.fingerprint,
         )
     except ValueError as exc:
         _complete_job(job, "failed", str(exc))
@@ -261,15 +779,211 @@ def process_job(job: BenchmarkJob) -> None:
     _complete_job(job, "succeeded", None)
 
 
-def worker_loop(stop_event: threading.Event, poll_interval: float = 2.0) -> None:
-    """Run a worker loop until ``stop_event`` is set."""
+def process_job_group(jobs: Sequence[BenchmarkJob]) -> None:
+    """Compute the benchmarks for jobs sharing one SIC from one peer download.
+
+    Peers are fetched once, for the largest ``max_companies`` in the group,
+    and each job uses the first ``max_companies`` of them.  Each peer's facts
+    are indexed once and shared by every statement and period.
+    """
+
+    if not jobs:
+        return
+    known = [job for job in jobs if job.statement in _JOB_LAYOUTS]
+    for job in jobs:
+        if job.statement not in _JOB_LAYOUTS:
+            _complete_job(job, "failed", f"Unknown statement '{job.statement}'")
+    if not known:
+        return
+
+    try:
+        industry_info, peers, peer_facts = fetch_peer_company_facts(
+            known[0].subject_cik,
+            max_companies=max(job.max_companies for job in known),
+            tags=LAYOUT_TAGS,
+        )
+    except (SECClientError, KeyError) as exc:
+        for job in known:
+            _fail_job(job, str(exc), _retry_policy(exc))
+        return
+
+    if not peer_facts:
+        for job in known:
+            _complete_job(job, "failed", "No peer filings available")
+        return
+
+    indexes = [index_facts(facts) for facts in peer_facts]
+    for job in known:
+        _store_job_benchmark(job, industry_info, peers, indexes)
+
+
+def process_job(job: BenchmarkJob) -> None:
+    process_job_group([job])
+
+
+def worker_loop(
+    stop_event: threading.Event,
+    poll_interval: float = 2.0,
+    *,
+    worker_id: Optional[str] = None,
+) -> None:
+    """Run a worker loop until ``stop_event`` is set.
+
+    Idle workers wake as soon as a job is enqueued (see
+    :func:`_wait_for_work`) and recheck the queue at least every
+    ``poll_interval`` seconds, which also picks up jobs whose lease expired.
+    The lease on each claimed job is renewed every third of
+    ``COMMONIZE_JOB_LEASE_SECONDS`` while it is processed.  Unexpected errors
+    fail the claimed jobs (see :func:`_fail_job`) instead of ending the loop.
+    """
+
+    worker_id = worker_id or default_worker_id()
+    try:
+        while not stop_event.is_set():
+            try:
+                version = _data_version(_connect())
+                jobs = claim_job_group(worker_id)
+            except sqlite3.Error:
+                logger.exception("Could not claim benchmark jobs")
+                stop_event.wait(poll_interval)
+                continue
+            if not jobs:
+                _wait_for_work(stop_event, poll_interval, version)
+                continue
+            try:
+                with _LeaseKeeper(jobs, _LEASE_SECONDS / 3):
+                    process_job_group(jobs)
+            except Exception as exc:
+                logger.exception("Benchmark jobs for SIC %s failed", jobs[0].sic)
+                _fail_jobs(jobs, exc)
+    finally:
+        db.close_thread_connections()
 
-    while not stop_event.is_set():
-        job = claim_next_job()
-        if job is None:
-            stop_event.wait(poll_interval)
-            continue
-        process_job(job)
+
+def run_workers(
+    stop_event: threading.Event,
+    workers: int = 1,
+    poll_interval: float = 2.0,
+    *,
+    refresh_interval: Optional[float] = None,
+) -> None:
+    """Run ``workers`` worker loops on threads until ``stop_event`` is set.
+
+    When ``refresh_interval`` is positive a :func:`scheduler_loop` thread runs
+    alongside them.
+    """
+
+    threads = [
+        threading.Thread(
+            target=worker_loop,
+            args=(stop_event, poll_interval),
+            name=f"commonize-worker-{index}",
+            daemon=True,
+        )
+        for index in range(max(1, workers))
+    ]
+    if refresh_interval and refresh_interval > 0:
+        threads.append(
+            threading.Thread(
+                target=scheduler_loop,
+                args=(stop_event, refresh_interval),
+                name="commonize-refresh-scheduler",
+                daemon=True,
+            )
+        )
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        while thread.is_alive():
+            thread.join(timeout=0.5)
+
+
+def schedule_refreshes(
+    *,
+    limit: Optional[int] = None,
+    horizon_seconds: Optional[float] = None,
+    window_seconds: Optional[float] = None,
+    min_requests: int = 1,
+) -> int:
+    """Requeue popular benchmarks that are about to expire; return how many.
+
+    Benchmarks expiring within ``horizon_seconds`` (or already expired) that
+    were requested at least ``min_requests`` times in the last
+    ``window_seconds`` are queued in the background lane, most requested
+    first, at most ``limit`` per call so refreshes trickle out within the SEC
+    budget.  Only benchmarks with an earlier job are considered, since that
+    job records the subject company used to find peers; benchmarks with a
+    job already pending, running or dead are left alone, as are those whose
+    job failed within ``FAILED_REFRESH_COOLDOWN`` seconds.
+    """
+
+    limit = _REFRESH_BATCH if limit is None else limit
+    horizon_seconds = _REFRESH_HORIZON if horizon_seconds is None else horizon_seconds
+    window_seconds = _REFRESH_WINDOW if window_seconds is None else window_seconds
+    if limit <= 0:
+        return 0
+
+    # Page views in this process count toward popularity straight away.
+    flush_benchmark_requests()
+    now = time.time()
+    with db.transaction(_connect()) as conn:
+        due = conn.execute(
+            """
+            SELECT b.sic, b.statement, b.period, COALESCE(SUM(r.requests), 0) AS popularity
+            FROM industry_benchmarks AS b
+            JOIN benchmark_jobs AS j
+              ON j.sic = b.sic AND j.statement = b.statement AND j.period = b.period
+            LEFT JOIN benchmark_requests AS r
+              ON r.sic = b.sic AND r.statement = b.statement AND r.period = b.period
+             AND r.bucket >= :since
+            WHERE b.updated_at < :refresh_before
+              AND j.status NOT IN ('pending', 'running', 'dead')
+              AND NOT (j.status = 'failed' AND COALESCE(j.finished_at, 0) > :failed_before)
+            GROUP BY b.sic, b.statement, b.period
+            HAVING popularity >= :min_requests
+            ORDER BY popularity DESC, b.updated_at ASC
+            LIMIT :limit
+            """,
+            {
+                "since": now - window_seconds,
+                "refresh_before": now - max(0.0, DEFAULT_TTL_SECONDS - horizon_seconds),
+                "min_requests": min_requests,
+                "failed_before": now - FAILED_REFRESH_COOLDOWN,
+                "limit": limit,
+            },
+        ).fetchall()
+        for sic, statement, period, _ in due:
+            conn.execute(
+                """
+                UPDATE benchmark_jobs
+                SET status = 'pending', queued_at = ?, started_at = NULL,
+                    finished_at = NULL, attempts = 0, error = NULL,
+                    worker_id = NULL, lease_expires_at = NULL, heartbeat_at = NULL,
+                    priority = ?, promoted_at = NULL, not_before = NULL
+                WHERE sic = ? AND statement = ? AND period = ?
+                """,
+                (now, PRIORITY_BACKGROUND, sic, statement, period),
+            )
+
+    if due:
+        _notify_workers()
+    return len(due)
+
+
+def scheduler_loop(stop_event: threading.Event, interval: Optional[float] = None) -> None:
+    """Call :func:`schedule_refreshes` every ``interval`` seconds until stopped."""
+
+    interval = _REFRESH_INTERVAL if interval is None else interval
+    try:
+        while not stop_event.is_set():
+            try:
+                prune_benchmark_requests(_REFRESH_WINDOW)
+                schedule_refreshes()
+            except sqlite3.Error:
+                logger.exception("Could not schedule benchmark refreshes")
+            stop_event.wait(interval)
+    finally:
+        db.close_thread_connections()
 
 
 def ensure_benchmark_ready(
@@ -279,11 +993,19 @@ def ensure_benchmark_ready(
     period: str,
     *,
     max_companies: int,
+    priority: int = PRIORITY_BACKGROUND,
 ) -> Optional[BenchmarkJob]:
-    """Ensure a benchmark exists, queueing work when missing."""
+    """Ensure a benchmark exists, queueing work in the ``priority`` lane when missing."""
 
-    benchmark = load_benchmark(industry.sic, statement, period)
-    if benchmark is not None:
+    layout = _JOB_LAYOUTS.get(statement)
+    benchmark = load_benchmark(
+        industry.sic,
+        statement,
+        period,
+        row_keys=layout.row_keys if layout else None,
+        layout_fingerprint=layout.fingerprint if layout else None,
+    )
+    if benchmark is not None and benchmark.complete:
         return None
 
     enqueue_benchmark_job(
@@ -292,16 +1014,37 @@ def ensure_benchmark_ready(
         statement,
         period,
         max_companies=max_companies,
+        # A benchmark computed for an older layout is refreshed even if its
+        # previous job already finished.
+        force=benchmark is not None,
+        priority=priority,
     )
     return get_job_status(industry.sic, statement, period)
 
 
 __all__ = [
     "BenchmarkJob",
+    "DEFAULT_REFRESH_INTERVAL",
+    "FAILED_REFRESH_COOLDOWN",
+    "PRIORITY_BACKGROUND",
+    "PRIORITY_CLI",
+    "PRIORITY_INTERACTIVE",
+    "RetryPolicy",
+    "THROTTLE_RETRY",
+    "TRANSIENT_RETRY",
     "enqueue_benchmark_job",
     "get_job_status",
+    "claim_job_group",
     "claim_next_job",
+    "default_worker_id",
+    "heartbeat",
+    "list_dead_jobs",
     "process_job",
+    "process_job_group",
+    "requeue_dead_jobs",
+    "run_workers",
+    "schedule_refreshes",
+    "scheduler_loop",
     "worker_loop",
     "ensure_benchmark_ready",
 ]
@@ -1,34 +1,96 @@
 """Utilities for communicating with the SEC data APIs."""
 from __future__ import annotations
 
+import gzip
+import io
 import json
 import os
+import shutil
+import sqlite3
+import threading
 import time
-from dataclasses import dataclass
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Tuple
+from typing import (
+    AbstractSet,
+    BinaryIO,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 try:
     import requests
 except ImportError:  # pragma: no cover - allows unit tests without requests
     requests = None  # type: ignore
 
+try:
+    import ijson
+except ImportError:  # pragma: no cover - streaming parses fall back to json
+    ijson = None  # type: ignore
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms share the budget per process only
+    fcntl = None  # type: ignore
+
+from . import db
+
 _DEFAULT_USER_AGENT = os.environ.get(
     "COMMONIZE_USER_AGENT",
     "Commonize/0.1 (your_email@example.com)",
 )
 
+_HTTP_POOL_SIZE = int(os.environ.get("COMMONIZE_HTTP_POOL_SIZE", 10))
+_HTTP_TIMEOUT = float(os.environ.get("COMMONIZE_HTTP_TIMEOUT", 30))
+
+# SEC's fair-access policy allows at most 10 requests per second per client.
+_SEC_RATE_LIMIT = float(os.environ.get("COMMONIZE_SEC_RATE_LIMIT", 10))
+_SEC_BURST = float(os.environ.get("COMMONIZE_SEC_BURST", 1))
+# Cached company facts younger than this are served without contacting the SEC.
+_FACTS_MAX_AGE = int(os.environ.get("COMMONIZE_FACTS_MAX_AGE", 60 * 60 * 12))
+_PEER_CONCURRENCY = int(os.environ.get("COMMONIZE_PEER_CONCURRENCY", 4))
+# Bytes read from the network or disk at a time when streaming payloads.
+_STREAM_CHUNK_SIZE = 1024 * 1024
+
 _TICKER_CACHE = Path(os.environ.get("COMMONIZE_CACHE", "./.commonize-cache"))
 _TICKER_CACHE.mkdir(parents=True, exist_ok=True)
 _TICKER_CACHE_FILE = _TICKER_CACHE / "ticker_cik_map.json"
+# Legacy JSON SIC cache, imported into the SQLite store on first use.
 _SIC_CACHE_FILE = _TICKER_CACHE / "cik_sic_map.json"
+# Company industries share the SQLite database used for industry benchmarks.
+_SIC_DB_FILE = _TICKER_CACHE / "industry_benchmarks.sqlite3"
+_RATE_LIMIT_FILE = _TICKER_CACHE / "sec_rate_limit.json"
+_FACTS_CACHE_DIR = _TICKER_CACHE / "companyfacts"
+_FACTS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
 class SECClientError(RuntimeError):
-    """Raised when a request to the SEC API fails."""
+    """Raised when a request to the SEC API fails.
 
+    ``status_code`` is the HTTP status of the failed response, or ``None``
+    when no response was received at all.
+    """
 
-@dataclass
+    def __init__(self, message: str, *, status_code: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+    @property
+    def retryable(self) -> bool:
+        """Whether the failure is likely transient (throttling, outages, network)."""
+
+        return self.status_code is None or self.status_code == 429 or self.status_code >= 500
+
+
+@dataclass(slots=True)
 class TickerInfo:
     ticker: str
     cik_str: str
@@ -45,38 +107,295 @@ class IndustryInfo:
     description: Optional[str]
 
 
-_sic_cache: Optional[Dict[str, Dict[str, Optional[str]]]] = None
-
-
-def _load_sic_cache() -> Dict[str, Dict[str, Optional[str]]]:
-    global _sic_cache
-    if _sic_cache is not None:
-        return _sic_cache
+def _ensure_sic_schema(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS company_industries (
+            cik TEXT PRIMARY KEY,
+            sic TEXT,
+            sic_description TEXT,
+            updated_at REAL NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS company_industries_by_sic ON company_industries (sic)"
+    )
     if not _SIC_CACHE_FILE.exists():
-        _sic_cache = {}
-        return _sic_cache
+        return
+    if conn.execute("SELECT 1 FROM company_industries LIMIT 1").fetchone() is not None:
+        return
     with _SIC_CACHE_FILE.open("r", encoding="utf-8") as fh:
-        _sic_cache = json.load(fh)
-    return _sic_cache
+        legacy = json.load(fh)
+    _upsert_industries(conn, legacy)
+
+
+def _sic_connect() -> sqlite3.Connection:
+    return db.connect(_SIC_DB_FILE, _ensure_sic_schema)
+
+
+def _upsert_industries(
+    conn: sqlite3.Connection, records: Dict[str, Dict[str, Optional[str]]]
+) -> None:
+    now = time.time()
+    conn.executemany(
+        """
+        INSERT INTO company_industries (cik, sic, sic_description, updated_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(cik) DO UPDATE SET
+            sic = excluded.sic,
+            sic_description = excluded.sic_description,
+            updated_at = excluded.updated_at
+        """,
+        [
+            (
+                cik.zfill(10),
+                None if record.get("sic") is None else str(record.get("sic")),
+                record.get("sic_description"),
+                now,
+            )
+            for cik, record in records.items()
+        ],
+    )
+
+
+def _lookup_industry(cik: str) -> Optional[Dict[str, Optional[str]]]:
+    with db.transaction(_sic_connect(), write=False) as conn:
+        row = conn.execute(
+            "SELECT sic, sic_description FROM company_industries WHERE cik = ?",
+            (cik,),
+        ).fetchone()
+    if row is None:
+        return None
+    return {"sic": row[0], "sic_description": row[1]}
+
+
+def _ciks_for_sic(sic: str) -> List[str]:
+    with db.transaction(_sic_connect(), write=False) as conn:
+        rows = conn.execute(
+            "SELECT cik FROM company_industries WHERE sic = ?",
+            (str(sic),),
+        ).fetchall()
+    return [row[0] for row in rows]
 
 
-def _save_sic_cache(data: Dict[str, Dict[str, Optional[str]]]) -> None:
-    global _sic_cache
-    _sic_cache = data
-    with _SIC_CACHE_FILE.open("w", encoding="utf-8") as fh:
-        json.dump(data, fh)
+# CIKs bound per ``IN`` query, well below SQLite's host parameter limit.
+_CIK_BATCH_SIZE = 500
+
+
+def _missing_industry_ciks(ciks: Sequence[str]) -> List[str]:
+    """Return the ``ciks`` without a stored SIC record, in their original order.
+
+    Each batch is answered from the primary key index, so the cost follows the
+    number of CIKs asked about rather than the size of the store.
+    """
+
+    known: set = set()
+    with db.transaction(_sic_connect(), write=False) as conn:
+        for start in range(0, len(ciks), _CIK_BATCH_SIZE):
+            batch = ciks[start : start + _CIK_BATCH_SIZE]
+            placeholders = ", ".join("?" * len(batch))
+            known.update(
+                row[0]
+                for row in conn.execute(
+                    f"SELECT cik FROM company_industries WHERE cik IN ({placeholders})",
+                    batch,
+                )
+            )
+    return [cik for cik in ciks if cik not in known]
+
+
+class RateLimiter:
+    """Token bucket limiting how quickly requests may be sent to the SEC.
+
+    The bucket refills at ``rate`` tokens per second up to ``capacity``.  It is
+    thread-safe, and when ``state_path`` is provided (and ``fcntl`` is
+    available) the bucket state lives in that file under an exclusive lock so
+    every process sharing the cache directory draws from the same budget.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        *,
+        state_path: Optional[Path] = None,
+        clock=time.time,
+        sleeper=time.sleep,
+    ) -> None:
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self.state_path = state_path if fcntl is not None else None
+        self._clock = clock
+        self._sleeper = sleeper
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._updated = clock()
+
+    def acquire(self) -> None:
+        """Block until a request may be sent, then consume one token."""
+
+        if self.rate <= 0:
+            return
+        with self._lock:
+            while True:
+                wait = self._take()
+                if wait <= 0:
+                    return
+                self._sleeper(wait)
+
+    def _take(self) -> float:
+        if self.state_path is None:
+            self._tokens, self._updated, wait = self._refill_and_take(self._tokens, self._updated)
+            return wait
+
+        fd = os.open(self.state_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            raw = os.read(fd, 256)
+            try:
+                state = json.loads(raw) if raw else {}
+                tokens = float(state["tokens"])
+                updated = float(state["updated"])
+            except (KeyError, TypeError, ValueError):
+                tokens, updated = self.capacity, self._clock()
+            tokens, updated, wait = self._refill_and_take(tokens, updated)
+            payload = json.dumps({"tokens": tokens, "updated": updated}).encode("utf-8")
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, payload)
+            return wait
+        finally:
+            os.close(fd)  # closing the descriptor releases the lock
+
+    def _refill_and_take(self, tokens: float, updated: float) -> Tuple[float, float, float]:
+        now = self._clock()
+        elapsed = max(now - updated, 0.0)
+        tokens = min(self.capacity, tokens + elapsed * self.rate)
+        # Tolerate float error so a refill that lands just short of one token
+        # does not request a sleep too small to advance the clock.
+        if tokens >= 1.0 - 1e-9:
+            return max(tokens - 1.0, 0.0), now, 0.0
+        return tokens, now, (1.0 - tokens) / self.rate
+
+
+def _budget_limiter(limit: float, burst: float, **kwargs) -> RateLimiter:
+    """Return a limiter that never sends more than ``limit`` requests in any second.
+
+    A full bucket of ``burst`` tokens plus a second of refill must stay within
+    ``limit``, so the burst is capped at ``limit`` and the refill rate is
+    lowered by the extra burst tokens.
+    """
+
+    if limit <= 0:
+        return RateLimiter(0, 1, **kwargs)
+    burst = max(1.0, min(burst, limit))
+    return RateLimiter(limit - burst + 1, burst, **kwargs)
+
+
+_rate_limiter = _budget_limiter(_SEC_RATE_LIMIT, _SEC_BURST, state_path=_RATE_LIMIT_FILE)
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _create_session(pool_size: int):
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(
+        {
+            "User-Agent": _DEFAULT_USER_AGENT,
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+        }
+    )
+    return session
 
 
-def _request_json(url: str, *, sleep: float = 0.2) -> dict:
+def get_session():
+    """Return the process-wide pooled HTTP session used for SEC requests.
+
+    Connections are kept alive and reused across calls, and gzip/deflate
+    responses are decoded transparently by ``requests``.  The pool size can be
+    tuned with ``COMMONIZE_HTTP_POOL_SIZE``.
+    """
+
+    global _session
     if requests is None:  # pragma: no cover - exercised when dependency missing
         raise ImportError("The 'requests' package is required to call the SEC API.")
-    headers = {"User-Agent": _DEFAULT_USER_AGENT, "Accept-Encoding": "gzip, deflate"}
-    response = requests.get(url, headers=headers, timeout=30)
-    if response.status_code != 200:
-        raise SECClientError(f"SEC request failed with status {response.status_code}: {url}")
-    if sleep:
-        time.sleep(sleep)  # be kind to SEC infrastructure
-    return response.json()
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _create_session(_HTTP_POOL_SIZE)
+    return _session
+
+
+def close_session() -> None:
+    """Close the shared HTTP session and release pooled connections."""
+
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def _request(
+    url: str,
+    *,
+    headers: Optional[Dict[str, str]] = None,
+    allowed_status: Tuple[int, ...] = (200,),
+    stream: bool = False,
+):
+    session = get_session()
+    _rate_limiter.acquire()  # be kind to SEC infrastructure
+    try:
+        response = session.get(url, headers=headers, timeout=_HTTP_TIMEOUT, stream=stream)
+    except requests.RequestException as exc:
+        raise SECClientError(f"SEC request failed: {url}: {exc}") from exc
+    if response.status_code not in allowed_status:
+        response.close()
+        raise SECClientError(
+            f"SEC request failed with status {response.status_code}: {url}",
+            status_code=response.status_code,
+        )
+    return response
+
+
+def _request_json(url: str) -> dict:
+    return _request(url).json()
+
+
+class _TickerIndex:
+    """Compact in-memory view of ``ticker_cik_map.json``."""
+
+    __slots__ = ("by_ticker", "by_cik", "cik_positions", "mtime")
+
+    def __init__(self, by_ticker: Dict[str, TickerInfo], mtime: Optional[float]) -> None:
+        self.by_ticker = by_ticker
+        self.by_cik: Dict[str, TickerInfo] = {}
+        for info in by_ticker.values():
+            self.by_cik.setdefault(info.cik, info)
+        # Position of each company in the SEC file, which is ordered by size.
+        self.cik_positions = {cik: position for position, cik in enumerate(self.by_cik)}
+        self.mtime = mtime
+
+
+_ticker_index: Optional[_TickerIndex] = None
+_ticker_index_lock = threading.Lock()
+
+
+def _ticker_cache_mtime() -> Optional[float]:
+    try:
+        return _TICKER_CACHE_FILE.stat().st_mtime
+    except OSError:
+        return None
 
 
 def _load_ticker_cache() -> Dict[str, TickerInfo]:
@@ -88,17 +407,12 @@ def _load_ticker_cache() -> Dict[str, TickerInfo]:
 
 
 def _save_ticker_cache(data: Dict[str, TickerInfo]) -> None:
-    serializable = {k: v.__dict__ for k, v in data.items()}
+    serializable = {k: asdict(v) for k, v in data.items()}
     with _TICKER_CACHE_FILE.open("w", encoding="utf-8") as fh:
         json.dump(serializable, fh)
 
 
-def fetch_ticker_map(force_refresh: bool = False) -> Dict[str, TickerInfo]:
-    """Return a mapping of ticker -> ticker information from the SEC."""
-    cache = _load_ticker_cache()
-    if cache and not force_refresh:
-        return cache
-
+def _download_ticker_map() -> Dict[str, TickerInfo]:
     url = "https://www.sec.gov/files/company_tickers.json"
     data = _request_json(url)
     mapping: Dict[str, TickerInfo] = {}
@@ -113,6 +427,39 @@ def fetch_ticker_map(force_refresh: bool = False) -> Dict[str, TickerInfo]:
     return mapping
 
 
+def _get_ticker_index(force_refresh: bool = False) -> _TickerIndex:
+    """Return the memoised ticker index, reloading it when the file changes."""
+
+    global _ticker_index
+    index = _ticker_index
+    if not force_refresh and index is not None and index.mtime == _ticker_cache_mtime():
+        return index
+
+    with _ticker_index_lock:
+        index = _ticker_index
+        mtime = _ticker_cache_mtime()
+        if not force_refresh and index is not None and index.mtime == mtime:
+            return index
+        mapping = {} if force_refresh else _load_ticker_cache()
+        if not mapping:
+            mapping = _download_ticker_map()
+            mtime = _ticker_cache_mtime()
+        index = _TickerIndex(mapping, mtime)
+        _ticker_index = index
+    return index
+
+
+def fetch_ticker_map(force_refresh: bool = False) -> Dict[str, TickerInfo]:
+    """Return a mapping of ticker -> ticker information from the SEC.
+
+    The mapping is parsed once per process and shared between callers, so it
+    must not be mutated.  It is reloaded when ``ticker_cik_map.json`` changes
+    on disk or when ``force_refresh`` is set.
+    """
+
+    return _get_ticker_index(force_refresh=force_refresh).by_ticker
+
+
 def resolve_cik(ticker_or_cik: str, *, force_refresh: bool = False) -> TickerInfo:
     candidate = ticker_or_cik.strip().upper()
     if candidate.isdigit() and len(candidate) <= 10:
@@ -124,31 +471,289 @@ def resolve_cik(ticker_or_cik: str, *, force_refresh: bool = False) -> TickerInf
     return mapping[candidate]
 
 
-def fetch_company_facts(cik: str) -> dict:
+def _facts_cache_paths(cik: str) -> Tuple[Path, Path]:
+    stem = f"CIK{cik}"
+    return _FACTS_CACHE_DIR / f"{stem}.json.gz", _FACTS_CACHE_DIR / f"{stem}.meta.json"
+
+
+def _load_facts_metadata(meta_path: Path) -> Optional[Dict[str, object]]:
+    try:
+        with meta_path.open("r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+@contextmanager
+def _atomic_writer(path: Path, *, compress: bool = False) -> Iterator[BinaryIO]:
+    """Yield a file that replaces ``path`` once the block completes without error."""
+
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with tmp_path.open("wb") as raw:
+            fh = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) if compress else raw
+            try:
+                yield fh
+            finally:
+                if compress:
+                    fh.close()
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def _write_atomic(path: Path, data: Union[bytes, BinaryIO], *, compress: bool = False) -> None:
+    with _atomic_writer(path, compress=compress) as fh:
+        if isinstance(data, bytes):
+            fh.write(data)
+        else:
+            shutil.copyfileobj(data, fh, _STREAM_CHUNK_SIZE)
+
+
+class _TeeReader(io.RawIOBase):
+    """Readable stream over response chunks that copies each chunk to ``sink``.
+
+    A failed write to ``sink`` is remembered in ``sink_error`` and stops the
+    copy without interrupting the reader.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        super().__init__()
+        self._chunks = iter(chunks)
+        self._pending = b""
+        self.sink: Optional[BinaryIO] = None
+        self.sink_error: Optional[OSError] = None
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._copy(chunk)
+            self._pending = chunk
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def drain(self) -> None:
+        """Copy the chunks the parser did not read to ``sink``."""
+
+        self._pending = b""
+        for chunk in self._chunks:
+            self._copy(chunk)
+
+    def _copy(self, chunk: bytes) -> None:
+        if self.sink is None or self.sink_error is not None:
+            return
+        try:
+            self.sink.write(chunk)
+        except OSError as exc:
+            self.sink_error = exc
+
+
+def _store_facts_metadata(meta_path: Path, metadata: Dict[str, object]) -> None:
+    _write_atomic(meta_path, json.dumps(metadata).encode("utf-8"))
+
+
+def store_company_facts(
+    cik: str,
+    content: Union[bytes, BinaryIO],
+    *,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+    fetched_at: Optional[float] = None,
+) -> None:
+    """Write a raw companyfacts JSON document into the on-disk cache.
+
+    ``content`` may be bytes or a binary stream; streams are compressed in
+    chunks so large documents never need to be held in memory.
+    """
+
+    payload_path, meta_path = _facts_cache_paths(cik.zfill(10))
+    _write_atomic(payload_path, content, compress=True)
+    _store_facts_metadata(
+        meta_path,
+        {
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time() if fetched_at is None else fetched_at,
+        },
+    )
+
+
+def parse_company_facts(source: BinaryIO, tags: Optional[AbstractSet[str]] = None) -> dict:
+    """Parse a companyfacts document from ``source``.
+
+    When ``tags`` is given only those ``us-gaap`` tags are kept.  With
+    ``ijson`` installed the document is streamed as parser events: only the
+    requested tags are built into Python objects, other taxonomies and tags
+    are skipped without being materialised, and reading stops once the
+    ``us-gaap`` section ends.
+    """
+
+    if tags is None:
+        return json.load(source)
+    if ijson is None:
+        data = json.load(source)
+        taxonomy = data.get("facts", {}).get("us-gaap", {})
+        return {"facts": {"us-gaap": {tag: taxonomy[tag] for tag in tags if tag in taxonomy}}}
+
+    selected: Dict[str, dict] = {}
+    events = ijson.parse(source, use_float=True)
+    for prefix, event, value in events:
+        if prefix != "facts.us-gaap":
+            continue
+        if event == "map_key" and value in tags:
+            selected[value] = _build_value(events)
+        elif event == "end_map":
+            break
+    return {"facts": {"us-gaap": selected}}
+
+
+def _build_value(events: Iterator[Tuple[str, str, object]]) -> object:
+    # Build the value whose first event comes next from ``events``.
+    builder = ijson.ObjectBuilder()
+    depth = 0
+    for _, event, value in events:
+        builder.event(event, value)
+        if event in ("start_map", "start_array"):
+            depth += 1
+        elif event in ("end_map", "end_array"):
+            depth -= 1
+        if depth == 0:
+            break
+    return builder.value
+
+
+_JSON_ERRORS: Tuple[type, ...] = (ValueError,) if ijson is None else (ValueError, ijson.JSONError)
+
+
+def _load_cached_facts(
+    payload_path: Path, tags: Optional[AbstractSet[str]] = None
+) -> Optional[dict]:
+    try:
+        with gzip.open(payload_path, "rb") as fh:
+            return parse_company_facts(fh, tags)
+    except (OSError, EOFError) + _JSON_ERRORS:
+        return None
+
+
+def fetch_company_facts(
+    cik: str,
+    *,
+    max_age: Optional[float] = None,
+    force_refresh: bool = False,
+    tags: Optional[AbstractSet[str]] = None,
+) -> dict:
+    """Return the companyfacts document for ``cik``.
+
+    Payloads are kept gzip-compressed under ``COMMONIZE_CACHE``.  Entries
+    younger than ``max_age`` seconds (``COMMONIZE_FACTS_MAX_AGE`` by default)
+    are served from disk; older entries are revalidated with a conditional
+    request so an unchanged filing only costs a 304 response.  Passing
+    ``tags`` limits the result to those ``us-gaap`` tags (see
+    :func:`parse_company_facts`).
+    """
+
     info = resolve_cik(cik)
     url = f"https://data.sec.gov/api/xbrl/companyfacts/CIK{info.cik}.json"
-    return _request_json(url, sleep=0.4)
+    if max_age is None:
+        max_age = _FACTS_MAX_AGE
+
+    payload_path, meta_path = _facts_cache_paths(info.cik)
+    metadata = _load_facts_metadata(meta_path) if payload_path.exists() else None
+    if metadata is not None and not force_refresh:
+        fetched_at = float(metadata.get("fetched_at") or 0)
+        if max_age > 0 and time.time() - fetched_at <= max_age:
+            cached = _load_cached_facts(payload_path, tags)
+            if cached is not None:
+                return cached
+
+    headers: Dict[str, str] = {}
+    if metadata is not None:
+        if metadata.get("etag"):
+            headers["If-None-Match"] = str(metadata["etag"])
+        if metadata.get("last_modified"):
+            headers["If-Modified-Since"] = str(metadata["last_modified"])
+
+    response = _request(url, headers=headers or None, allowed_status=(200, 304), stream=True)
+    if response.status_code == 304:
+        response.close()
+        cached = _load_cached_facts(payload_path, tags) if metadata is not None else None
+        if cached is not None:
+            metadata["fetched_at"] = time.time()
+            try:
+                _store_facts_metadata(meta_path, metadata)
+            except OSError:  # pragma: no cover - cache is best effort
+                pass
+            return cached
+        response = _request(url, stream=True)
+
+    try:
+        return _stream_company_facts(info.cik, response, tags)
+    finally:
+        response.close()
+
+
+def _stream_company_facts(cik: str, response, tags: Optional[AbstractSet[str]]) -> dict:
+    # The body is compressed into the cache and parsed in the same pass, so
+    # it is never held in memory as a whole.
+    payload_path, meta_path = _facts_cache_paths(cik)
+    reader = _TeeReader(response.iter_content(_STREAM_CHUNK_SIZE))
+    facts: Optional[dict] = None
+    try:
+        with _atomic_writer(payload_path, compress=True) as sink:
+            reader.sink = sink
+            facts = parse_company_facts(reader, tags)
+            reader.drain()
+            if reader.sink_error is not None:
+                raise reader.sink_error
+        _store_facts_metadata(
+            meta_path,
+            {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "fetched_at": time.time(),
+            },
+        )
+    except OSError:  # pragma: no cover - cache is best effort
+        pass
+    if facts is None:  # pragma: no cover - the cache file could not be opened
+        reader.sink = None
+        facts = parse_company_facts(reader, tags)
+    return facts
 
 
 def fetch_company_submissions(cik: str) -> dict:
     info = resolve_cik(cik)
     url = f"https://data.sec.gov/submissions/CIK{info.cik}.json"
-    return _request_json(url, sleep=0.4)
+    return _request_json(url)
+
+
+def store_company_industries(records: Dict[str, Dict[str, Optional[str]]]) -> None:
+    """Upsert CIK -> ``{"sic", "sic_description"}`` records in one transaction."""
+
+    if not records:
+        return
+    with db.transaction(_sic_connect()) as conn:
+        _upsert_industries(conn, records)
 
 
 def get_company_industry(cik: str) -> IndustryInfo:
     info = resolve_cik(cik)
-    cache = _load_sic_cache()
-    key = info.cik
-    record = cache.get(key)
+    record = _lookup_industry(info.cik)
     if record is None:
         submissions = fetch_company_submissions(info.cik)
         record = {
             "sic": submissions.get("sic"),
             "sic_description": submissions.get("sicDescription"),
         }
-        cache[key] = record
-        _save_sic_cache(cache)
+        store_company_industries({info.cik: record})
     return IndustryInfo(sic=record.get("sic"), description=record.get("sic_description"))
 
 
@@ -158,43 +763,52 @@ def find_industry_peers(
     max_companies: int = 5,
     candidate_pool: Optional[int] = None,
 ) -> Tuple[IndustryInfo, List[TickerInfo]]:
+    """Return companies sharing the SIC code of ``cik``.
+
+    Peers already present in the SIC store are found through its index on
+    the SIC column.  Only when that yields fewer than ``candidate_pool``
+    companies are tickers missing from the store looked up through the
+    submissions API; when every ticker is already stored there is nothing
+    left to look up.
+    """
+
     subject = resolve_cik(cik)
     industry = get_company_industry(subject.cik)
-    if industry.sic is None:
+    if industry.sic is None or max_companies <= 0:
         return industry, []
 
-    mapping = fetch_ticker_map()
-    cache = _load_sic_cache()
-    peers: List[TickerInfo] = []
-    updated = False
-
     if candidate_pool is None:
         candidate_pool = max(max_companies * 5, max_companies + 5, 20)
-    if max_companies <= 0:
-        candidate_pool = 0
-    for candidate in mapping.values():
-        if candidate.cik == subject.cik:
+
+    ticker_index = _get_ticker_index()
+    peers: List[TickerInfo] = [
+        ticker_index.by_cik[peer_cik]
+        for peer_cik in _ciks_for_sic(industry.sic)
+        if peer_cik != subject.cik and peer_cik in ticker_index.by_cik
+    ]
+    peers.sort(key=lambda candidate: ticker_index.cik_positions[candidate.cik])
+    if candidate_pool and len(peers) >= candidate_pool:
+        return industry, peers[:candidate_pool]
+
+    unknown = _missing_industry_ciks(
+        [candidate_cik for candidate_cik in ticker_index.by_cik if candidate_cik != subject.cik]
+    )
+    for candidate_cik in unknown:
+        candidate = ticker_index.by_cik[candidate_cik]
+        try:
+            submissions = fetch_company_submissions(candidate_cik)
+        except SECClientError:
             continue
-        record = cache.get(candidate.cik)
-        if record is None:
-            try:
-                submissions = fetch_company_submissions(candidate.cik)
-            except SECClientError:
-                continue
-            record = {
-                "sic": submissions.get("sic"),
-                "sic_description": submissions.get("sicDescription"),
-            }
-            cache[candidate.cik] = record
-            updated = True
+        record = {
+            "sic": submissions.get("sic"),
+            "sic_description": submissions.get("sicDescription"),
+        }
+        store_company_industries({candidate_cik: record})
         if record.get("sic") == industry.sic:
             peers.append(candidate)
         if candidate_pool and len(peers) >= candidate_pool:
             break
 
-    if updated:
-        _save_sic_cache(cache)
-
     return industry, peers
 
 
@@ -202,7 +816,23 @@ def fetch_peer_company_facts(
     cik: str,
     *,
     max_companies: int = 5,
+    concurrency: Optional[int] = None,
+    tags: Optional[AbstractSet[str]] = None,
 ) -> Tuple[IndustryInfo, List[TickerInfo], List[dict]]:
+    """Return company facts for up to ``max_companies`` same-SIC peers.
+
+    Up to ``concurrency`` downloads (``COMMONIZE_PEER_CONCURRENCY`` by default)
+    are kept in flight, all drawing from the shared SEC rate budget.  No more
+    downloads are started than are needed to reach ``max_companies``, and the
+    returned peers keep the order in which they were discovered.  ``tags`` is
+    forwarded to :func:`fetch_company_facts`.
+
+    Peers whose download fails are skipped.  If none succeed and at least one
+    failure was retryable (see :attr:`SECClientError.retryable`), the last such
+    error is raised so callers can retry instead of treating the industry as
+    having no filings.
+    """
+
     if max_companies <= 0:
         industry, _ = find_industry_peers(cik, max_companies=max_companies)
         return industry, [], []
@@ -212,90 +842,247 @@ def fetch_peer_company_facts(
         max_companies=max_companies,
         candidate_pool=max(max_companies * 5, max_companies + 5, 20),
     )
-    peer_facts: List[dict] = []
-    successful_peers: List[TickerInfo] = []
-    for peer in peers:
-        if len(successful_peers) >= max_companies:
-            break
-        try:
-            facts = fetch_company_facts(peer.cik)
-        except SECClientError:
-            continue
-        peer_facts.append(facts)
-        successful_peers.append(peer)
+    if concurrency is None:
+        concurrency = _PEER_CONCURRENCY
+    concurrency = max(1, concurrency)
+
+    results: Dict[int, dict] = {}
+    retryable_error: Optional[SECClientError] = None
+    pending: Dict[Future, int] = {}
+    next_index = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while True:
+            while (
+                next_index < len(peers)
+                and len(pending) < concurrency
+                and len(results) + len(pending) < max_companies
+            ):
+                future = executor.submit(
+                    fetch_company_facts, peers[next_index].cik, tags=tags
+                )
+                pending[future] = next_index
+                next_index += 1
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    results[index] = future.result()
+                except SECClientError as exc:
+                    if exc.retryable:
+                        retryable_error = exc
+                    continue
+            if len(results) >= max_companies:
+                for future in pending:
+                    future.cancel()
+                break
+
+    if not results and retryable_error is not None:
+        raise retryable_error
+
+    ordered = sorted(results)[:max_companies]
+    successful_peers = [peers[index] for index in ordered]
+    peer_facts = [results[index] for index in ordered]
     return industry, successful_peers, peer_facts
 
 
-def _iter_facts_for_tag(facts: dict, tag: str) -> Iterable[dict]:
-    taxonomy = facts.get("facts", {}).get("us-gaap", {})
-    if tag not in taxonomy:
-        return []
-    tag_info = taxonomy[tag]
-    for units in tag_info.get("units", {}).values():
-        for item in units:
-            yield item
+_ANNUAL_FISCAL_PERIODS = frozenset({"FY", "Q4", "12M"})
+_QUARTERLY_FISCAL_PERIODS = frozenset({"Q1", "Q2", "Q3", "Q4"})
+
+_IndexedFact = Tuple[datetime, dict]
+_FactGroup = Tuple[List[_IndexedFact], Dict[str, List[_IndexedFact]]]
+
+
+def _default_forms(period: str) -> Tuple[str, ...]:
+    return ("10-K",) if period == "annual" else ("10-Q", "10-K")
+
+
+def _reference_score(item: dict, reference: dict) -> int:
+    score = 0
+    if reference.get("accn") and item.get("accn") == reference.get("accn"):
+        score += 100
+    if reference.get("end") and item.get("end") == reference.get("end"):
+        score += 20
+    if reference.get("fy") and item.get("fy") == reference.get("fy"):
+        score += 10
+    if reference.get("form") and item.get("form") == reference.get("form"):
+        score += 1
+    return score
+
+
+class FactIndex:
+    """Pre-indexed view of a companyfacts payload.
+
+    Facts are grouped per ``us-gaap`` tag and period (annual, quarterly),
+    their ``end`` dates are parsed once, and each group is sorted newest
+    first and indexed by accession number.  Groups are built lazily the first
+    time a tag is requested and reused for every later lookup.
+    """
+
+    __slots__ = ("facts", "_taxonomy", "_groups")
+
+    def __init__(self, facts: dict) -> None:
+        self.facts = facts
+        self._taxonomy = facts.get("facts", {}).get("us-gaap", {})
+        self._groups: Dict[Tuple[str, str], _FactGroup] = {}
+
+    def __contains__(self, tag: str) -> bool:
+        return tag in self._taxonomy
+
+    def _group(self, tag: str, period: str) -> _FactGroup:
+        key = (tag, period)
+        group = self._groups.get(key)
+        if group is not None:
+            return group
+
+        if period == "annual":
+            fiscal_periods: Optional[AbstractSet[str]] = _ANNUAL_FISCAL_PERIODS
+        elif period == "quarterly":
+            fiscal_periods = _QUARTERLY_FISCAL_PERIODS
+        else:
+            fiscal_periods = None
+
+        entries: List[_IndexedFact] = []
+        tag_info = self._taxonomy.get(tag)
+        if tag_info:
+            for units in tag_info.get("units", {}).values():
+                for item in units:
+                    if fiscal_periods is not None and item.get("fp") not in fiscal_periods:
+                        continue
+                    try:
+                        end_date = datetime.fromisoformat(item.get("end"))
+                    except (TypeError, ValueError):
+                        continue
+                    entries.append((end_date, item))
+        # Stable sort keeps filing order among facts sharing an end date.
+        entries.sort(key=lambda entry: entry[0], reverse=True)
+
+        by_accession: Dict[str, List[_IndexedFact]] = {}
+        for entry in entries:
+            accession = entry[1].get("accn")
+            if accession:
+                by_accession.setdefault(accession, []).append(entry)
+
+        group = (entries, by_accession)
+        self._groups[key] = group
+        return group
+
+    def entries(
+        self, tag: str, *, period: str = "annual", forms: Optional[Iterable[str]] = None
+    ) -> List[_IndexedFact]:
+        """Return ``(end_date, fact)`` pairs for ``tag``, newest first."""
+
+        period = period.lower()
+        allowed = set(_default_forms(period) if forms is None else forms)
+        entries, _ = self._group(tag, period)
+        return [entry for entry in entries if entry[1].get("form") in allowed]
+
+    def select(
+        self,
+        tag: str,
+        *,
+        period: str = "annual",
+        forms: Optional[Iterable[str]] = None,
+        reference: Optional[dict] = None,
+    ) -> Optional[dict]:
+        """Return the fact for ``tag`` best matching ``reference`` (see :func:`select_fact`)."""
+
+        period = period.lower()
+        allowed = set(_default_forms(period) if forms is None else forms)
+        entries, by_accession = self._group(tag, period)
+
+        if reference:
+            accession = reference.get("accn")
+            if accession and accession in by_accession:
+                match = self._best_match(by_accession[accession], allowed, reference)
+                if match is not None:
+                    return match
+            match = self._best_match(entries, allowed, reference)
+            if match is not None:
+                return match
+
+        for _, item in entries:
+            if item.get("form") in allowed:
+                return item
+        return None
+
+    def align(
+        self,
+        tag: str,
+        references: Sequence[dict],
+        *,
+        period: str = "annual",
+        forms: Optional[Iterable[str]] = None,
+    ) -> List[Optional[dict]]:
+        """Return, for each reference, the fact for ``tag`` sharing its end date.
+
+        Facts from the reference's own filing (same accession), fiscal year or
+        form are preferred.  All references are served by one pass over the
+        tag's facts; references without a matching end date map to ``None``.
+        """
+
+        period = period.lower()
+        allowed = set(_default_forms(period) if forms is None else forms)
+        columns_by_end: Dict[str, List[int]] = {}
+        for column, reference in enumerate(references):
+            columns_by_end.setdefault(reference.get("end"), []).append(column)
+
+        best: List[Optional[dict]] = [None] * len(references)
+        best_scores = [-1] * len(references)
+        entries, _ = self._group(tag, period)
+        for _, item in entries:
+            columns = columns_by_end.get(item.get("end"))
+            if not columns or item.get("form") not in allowed:
+                continue
+            for column in columns:
+                score = _reference_score(item, references[column])
+                if score > best_scores[column]:
+                    best[column], best_scores[column] = item, score
+        return best
+
+    @staticmethod
+    def _best_match(
+        entries: List[_IndexedFact], allowed: AbstractSet[str], reference: dict
+    ) -> Optional[dict]:
+        best: Optional[dict] = None
+        best_key: Optional[Tuple[int, datetime]] = None
+        for end_date, item in entries:
+            if item.get("form") not in allowed:
+                continue
+            score = _reference_score(item, reference)
+            if not score:
+                continue
+            key = (score, end_date)
+            if best_key is None or key > best_key:
+                best, best_key = item, key
+        return best
+
+
+def index_facts(facts: Union[dict, FactIndex]) -> FactIndex:
+    """Return a :class:`FactIndex` for ``facts``, reusing an existing index."""
+
+    if isinstance(facts, FactIndex):
+        return facts
+    return FactIndex(facts)
 
 
 def select_fact(
-    facts: dict,
+    facts: Union[dict, FactIndex],
     tag: str,
     *,
     period: str = "annual",
     forms: Optional[Iterable[str]] = None,
     reference: Optional[dict] = None,
 ) -> Optional[dict]:
-    """Select the most recent fact for ``tag`` matching ``period``."""
-    period = period.lower()
-    if forms is None:
-        forms = ("10-K",) if period == "annual" else ("10-Q", "10-K")
-
-    reference_end = None
-    reference_form = None
-    reference_accn = None
-    reference_fy = None
-    if reference:
-        reference_end = reference.get("end")
-        reference_form = reference.get("form")
-        reference_accn = reference.get("accn")
-        reference_fy = reference.get("fy")
-
-    candidates: List[Tuple[int, datetime, dict]] = []
-    fallback_candidates: List[Tuple[datetime, dict]] = []
-    for item in _iter_facts_for_tag(facts, tag):
-        form = item.get("form")
-        if form not in forms:
-            continue
-        if period == "annual" and item.get("fp") not in {"FY", "Q4", "12M"}:
-            continue
-        if period == "quarterly" and item.get("fp") not in {"Q1", "Q2", "Q3", "Q4"}:
-            continue
-        end = item.get("end")
-        try:
-            end_date = datetime.fromisoformat(end)
-        except (TypeError, ValueError):
-            continue
-        match_score = 0
-        if reference_accn and item.get("accn") == reference_accn:
-            match_score += 100
-        if reference_end and item.get("end") == reference_end:
-            match_score += 20
-        if reference_fy and item.get("fy") == reference_fy:
-            match_score += 10
-        if reference_form and item.get("form") == reference_form:
-            match_score += 1
-        if match_score:
-            candidates.append((match_score, end_date, item))
-        else:
-            fallback_candidates.append((end_date, item))
+    """Select the most recent fact for ``tag`` matching ``period``.
 
-    if candidates:
-        candidates.sort(key=lambda x: (x[0], x[1]), reverse=True)
-        return candidates[0][2]
+    Facts sharing ``reference``'s accession number, end date, fiscal year or
+    form are preferred (in that order of weight); otherwise the latest fact is
+    returned.  Pass a :class:`FactIndex` to avoid re-indexing on every call.
+    """
 
-    if not fallback_candidates:
-        return None
-    fallback_candidates.sort(key=lambda x: x[0], reverse=True)
-    return fallback_candidates[0][1]
+    return index_facts(facts).select(tag, period=period, forms=forms, reference=reference)
 
 
 def _unit_multiplier(uom: Optional[str]) -> float:
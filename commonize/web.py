@@ -1,6 +1,7 @@
 """FastAPI application for rendering common size financial statements."""
 from __future__ import annotations
 
+import time
 from io import BytesIO, StringIO
 from pathlib import Path
 from typing import Callable, Dict, Iterable, List, Literal
@@ -11,18 +12,33 @@ from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 
 from .common_size import (
+    BALANCE_LAYOUT,
+    INCOME_LAYOUT,
     CommonSizeLine,
+    CompiledLayout,
     StatementNotAvailableError,
+    StatementSeries,
     build_balance_sheet,
+    build_balance_sheet_series,
     build_income_statement,
+    build_income_statement_series,
+)
+from .industry_cache import IndustryBenchmark, load_benchmark, record_benchmark_request
+from .industry_jobs import (
+    FAILED_REFRESH_COOLDOWN,
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    BenchmarkJob,
+    enqueue_benchmark_job,
+    get_job_status,
 )
-from .industry_cache import IndustryBenchmark, load_benchmark
-from .industry_jobs import enqueue_benchmark_job, get_job_status
 from .sec_client import (
     SECClientError,
+    IndustryInfo,
     TickerInfo,
     fetch_company_facts,
     get_company_industry,
+    index_facts,
     resolve_cik,
 )
 
@@ -37,7 +53,18 @@ _STATEMENT_BUILDERS: Dict[StatementType, Callable[..., List[CommonSizeLine]]] =
     "balance": build_balance_sheet,
 }
 
+_STATEMENT_LAYOUTS: Dict[StatementType, CompiledLayout] = {
+    "income": INCOME_LAYOUT,
+    "balance": BALANCE_LAYOUT,
+}
+
+_SERIES_BUILDERS: Dict[StatementType, Callable[..., StatementSeries]] = {
+    "income": build_income_statement_series,
+    "balance": build_balance_sheet_series,
+}
+
 _DEFAULT_WEB_PEERS = 10
+_MAX_HISTORY_PERIODS = 10
 
 
 def _format_currency(value: float | None) -> str:
@@ -66,28 +93,70 @@ def _apply_cached_industry(
     return benchmark.peer_count
 
 
+def _format_age(seconds: float) -> str:
+    for unit, size in (("day", 86_400), ("hour", 3_600), ("minute", 60)):
+        if seconds >= size:
+            count = int(seconds // size)
+            return f"{count} {unit}{'' if count == 1 else 's'}"
+    return "less than a minute"
+
+
+def _request_refresh(
+    info: TickerInfo, industry_info: IndustryInfo, statement: StatementType, period: PeriodType
+) -> BenchmarkJob | None:
+    job_status = get_job_status(industry_info.sic, statement, period)
+    # Dead-lettered jobs stay parked until an operator requeues them, and
+    # failed ones are retried at most once per cooldown.
+    if job_status is not None and job_status.status == "failed":
+        if time.time() - (job_status.finished_at or 0) < FAILED_REFRESH_COOLDOWN:
+            return job_status
+    if job_status is None or job_status.status not in ("pending", "running", "dead"):
+        enqueue_benchmark_job(
+            info,
+            industry_info,
+            statement,
+            period,
+            max_companies=_DEFAULT_WEB_PEERS,
+            force=True,
+            # The page already shows the old averages, so the refresh waits
+            # behind benchmarks that users have nothing for yet.
+            priority=PRIORITY_BACKGROUND,
+        )
+        job_status = get_job_status(industry_info.sic, statement, period)
+    return job_status
+
+
 def _prepare_statement(
-    ticker: str, statement: StatementType, period: PeriodType
+    ticker: str, statement: StatementType, period: PeriodType, history: int = 0
 ) -> tuple[TickerInfo, List[CommonSizeLine], dict]:
     builder = _STATEMENT_BUILDERS.get(statement)
     if builder is None:
         raise HTTPException(status_code=400, detail="Unsupported statement type")
 
     info = resolve_cik(ticker)
-    facts = fetch_company_facts(info.cik)
+    # Indexed once and shared by the statement and trend builders.
+    facts = index_facts(fetch_company_facts(info.cik))
     industry_info = get_company_industry(info.cik)
 
     lines = builder(facts, period=period)
-    expected_line_count = len(lines)
+    layout = _STATEMENT_LAYOUTS[statement]
+    record_benchmark_request(industry_info.sic, statement, period)
     benchmark = load_benchmark(
         industry_info.sic,
         statement,
         period,
-        expected_line_count=expected_line_count,
+        row_keys=layout.row_keys,
+        layout_fingerprint=layout.fingerprint,
+        allow_stale=True,
     )
     peer_count = _apply_cached_industry(lines, benchmark)
     job_status = None
 
+    if benchmark is not None and (benchmark.stale or not benchmark.complete):
+        # Expired benchmarks, and rows added or retagged since the benchmark
+        # was computed, are served as they are until the refresh lands.
+        job_status = _request_refresh(info, industry_info, statement, period)
+
     if benchmark is None:
         enqueue_benchmark_job(
             info,
@@ -95,27 +164,45 @@ def _prepare_statement(
             statement,
             period,
             max_companies=_DEFAULT_WEB_PEERS,
+            priority=PRIORITY_INTERACTIVE,
         )
         benchmark = load_benchmark(
             industry_info.sic,
             statement,
             period,
-            expected_line_count=expected_line_count,
+            row_keys=layout.row_keys,
+            layout_fingerprint=layout.fingerprint,
         )
         peer_count = _apply_cached_industry(lines, benchmark)
         if benchmark is None:
             job_status = get_job_status(industry_info.sic, statement, period)
 
+    series = None
+    if history > 0:
+        series = _SERIES_BUILDERS[statement](facts, period=period, periods=history)
+
     peers_payload = {
         "industry": industry_info,
         "peer_count": peer_count,
         "job": job_status,
+        "series": series,
+        "stale": benchmark is not None and benchmark.stale,
+        "age": _format_age(benchmark.age_seconds) if benchmark is not None else None,
     }
     return info, lines, peers_payload
 
-def _as_dataframe(lines: Iterable[CommonSizeLine]) -> pd.DataFrame:
+def _series_ratio(series: StatementSeries | None, row: int, column: int) -> float | None:
+    if series is None or row >= len(series.labels):
+        return None
+    value = series.ratios[row, column]
+    return None if value != value else float(value)  # NaN marks missing data
+
+
+def _as_dataframe(
+    lines: Iterable[CommonSizeLine], series: StatementSeries | None = None
+) -> pd.DataFrame:
     data: List[Dict[str, float | str | int | bool | None]] = []
-    for line in lines:
+    for index, line in enumerate(lines):
         percent = None if line.common_size is None else line.common_size * 100
         industry_percent = (
             None if line.industry_common_size is None else line.industry_common_size * 100
@@ -134,12 +221,24 @@ def _as_dataframe(lines: Iterable[CommonSizeLine]) -> pd.DataFrame:
                 "Heading": line.is_header,
             }
         )
+        if series is not None:
+            for column, end in enumerate(series.periods):
+                ratio = _series_ratio(series, index, column)
+                data[-1][f"Common Size {end} (%)"] = None if ratio is None else ratio * 100
     return pd.DataFrame(data)
 
 
-def _format_lines(lines: Iterable[CommonSizeLine]) -> List[Dict[str, str | int | bool]]:
-    formatted: List[Dict[str, str | int | bool]] = []
-    for line in lines:
+def _format_lines(
+    lines: Iterable[CommonSizeLine], series: StatementSeries | None = None
+) -> List[Dict[str, str | int | bool | List[str]]]:
+    formatted: List[Dict[str, str | int | bool | List[str]]] = []
+    for index, line in enumerate(lines):
+        trend = []
+        if series is not None:
+            trend = [
+                _format_percent(_series_ratio(series, index, column))
+                for column in range(len(series.periods))
+            ]
         formatted.append(
             {
                 "label": line.label,
@@ -149,6 +248,7 @@ def _format_lines(lines: Iterable[CommonSizeLine]) -> List[Dict[str, str | int |
                 "indent": line.indent,
                 "is_heading": line.is_header,
                 "is_emphasis": line.label.lower().startswith("total"),
+                "trend": trend,
             }
         )
     return formatted
@@ -165,12 +265,20 @@ def create_app() -> FastAPI:
         ticker: str = Query("", description="Ticker symbol or CIK"),
         statement: StatementType = Query("income", description="Statement to display"),
         period: PeriodType = Query("annual", description="Periodicity of filings"),
+        history: int = Query(
+            0,
+            ge=0,
+            le=_MAX_HISTORY_PERIODS,
+            description="Number of periods to show as trend columns",
+        ),
     ) -> HTMLResponse:
         context = {
             "request": request,
             "ticker": ticker,
             "statement": statement,
             "period": period,
+            "history": history,
+            "trend_periods": [],
             "company": None,
             "rows": None,
             "error": None,
@@ -183,7 +291,7 @@ def create_app() -> FastAPI:
 
         if ticker:
             try:
-                info, lines, peer_payload = _prepare_statement(ticker, statement, period)
+                info, lines, peer_payload = _prepare_statement(ticker, statement, period, history)
             except KeyError:
                 context["error"] = f"Unknown ticker symbol '{ticker}'."
             except StatementNotAvailableError as exc:  # pragma: no cover - error path
@@ -192,7 +300,9 @@ def create_app() -> FastAPI:
                 context["error"] = str(exc)
             else:
                 context["company"] = info
-                context["rows"] = _format_lines(lines)
+                series = peer_payload.get("series")
+                context["rows"] = _format_lines(lines, series)
+                context["trend_periods"] = series.periods if series is not None else []
                 context["industry"] = peer_payload.get("industry")
                 context["peer_count"] = peer_payload.get("peer_count", 0)
                 context["peers"] = peer_payload
@@ -205,9 +315,10 @@ def create_app() -> FastAPI:
         ticker: str,
         statement: StatementType = Query("income"),
         period: PeriodType = Query("annual"),
+        history: int = Query(0, ge=0, le=_MAX_HISTORY_PERIODS),
     ) -> StreamingResponse:
         try:
-            info, lines, _ = _prepare_statement(ticker, statement, period)
+            info, lines, payload = _prepare_statement(ticker, statement, period, history)
         except KeyError as exc:
             raise HTTPException(status_code=404, detail=str(exc)) from exc
         except StatementNotAvailableError as exc:
@@ -216,7 +327,7 @@ def create_app() -> FastAPI:
         filename = f"{info.ticker.lower()}_{statement}_{period}.{file_format}"
         headers = {"Content-Disposition": f"attachment; filename=\"{filename}\""}
 
-        dataframe = _as_dataframe(lines)
+        dataframe = _as_dataframe(lines, payload.get("series"))
 
         if file_format == "csv":
             buffer = StringIO()
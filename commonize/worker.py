@@ -1,15 +1,79 @@
 """Utility entrypoint for running the industry benchmark worker."""
 from __future__ import annotations
 
+import argparse
+import sys
 import threading
+from typing import Iterable
 
-from .industry_jobs import worker_loop
+from .industry_jobs import (
+    DEFAULT_REFRESH_INTERVAL,
+    list_dead_jobs,
+    requeue_dead_jobs,
+    run_workers,
+)
 
 
-def main() -> None:  # pragma: no cover - thin wrapper
+def parse_args(argv: Iterable[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Process queued industry benchmark jobs.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of jobs processed concurrently by this process (default: 1).",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=2.0,
+        help="Seconds an idle worker waits before checking the queue again (default: 2).",
+    )
+    parser.add_argument(
+        "--refresh-interval",
+        type=float,
+        default=DEFAULT_REFRESH_INTERVAL,
+        help=(
+            "Seconds between scans for popular benchmarks nearing expiry; 0 disables"
+            " the refresh scheduler (default: COMMONIZE_REFRESH_INTERVAL or 300)."
+        ),
+    )
+    parser.add_argument(
+        "--list-dead",
+        action="store_true",
+        help="List jobs that exhausted their retries and exit.",
+    )
+    parser.add_argument(
+        "--requeue-dead",
+        nargs="?",
+        const="",
+        metavar="SIC",
+        help="Requeue dead jobs (only those for SIC when given) and exit.",
+    )
+    return parser.parse_args(list(argv))
+
+
+def main(argv: Iterable[str] | None = None) -> None:  # pragma: no cover - thin wrapper
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.list_dead:
+        for job in list_dead_jobs():
+            print(
+                f"SIC {job.sic} {job.statement}/{job.period}: "
+                f"{job.attempts} attempts, last error: {job.error}"
+            )
+        return
+    if args.requeue_dead is not None:
+        count = requeue_dead_jobs(args.requeue_dead or None)
+        print(f"Requeued {count} dead job{'' if count == 1 else 's'}.")
+        return
+
     stop = threading.Event()
     try:
-        worker_loop(stop)
+        run_workers(
+            stop,
+            workers=args.workers,
+            poll_interval=args.poll_interval,
+            refresh_interval=args.refresh_interval,
+        )
     except KeyboardInterrupt:
         stop.set()
 
@@ -0,0 +1,40 @@
+import gzip
+import json
+import zipfile
+
+from commonize import bulk_ingest, sec_client
+
+
+def _write_archive(path, members):
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, payload in members.items():
+            archive.writestr(name, json.dumps(payload))
+
+
+def test_ingest_archives_fill_facts_and_sic_caches(tmp_path, monkeypatch):
+    monkeypatch.setattr(sec_client, "_FACTS_CACHE_DIR", tmp_path)
+    monkeypatch.setattr(sec_client, "_SIC_CACHE_FILE", tmp_path / "cik_sic_map.json")
+    monkeypatch.setattr(sec_client, "_SIC_DB_FILE", tmp_path / "cache.sqlite3")
+
+    facts_zip = tmp_path / "companyfacts.zip"
+    _write_archive(facts_zip, {"CIK0000000042.json": {"cik": 42, "facts": {}}})
+    submissions_zip = tmp_path / "submissions.zip"
+    _write_archive(
+        submissions_zip,
+        {
+            "CIK0000000042.json": {"sic": "3571", "sicDescription": "Computers"},
+            "CIK0000000042-submissions-001.json": {"accessionNumber": []},
+        },
+    )
+
+    summary = bulk_ingest.ingest_archives(companyfacts=facts_zip, submissions=submissions_zip)
+
+    assert summary.company_facts == 1
+    assert summary.industries == 1
+    assert summary.skipped == 1
+    with gzip.open(tmp_path / "CIK0000000042.json.gz", "rb") as fh:
+        assert json.load(fh) == {"cik": 42, "facts": {}}
+    industry = sec_client.get_company_industry("42")
+    assert industry.sic == "3571"
+    assert industry.description == "Computers"
+    assert sec_client._ciks_for_sic("3571") == ["0000000042"]
@@ -3,6 +3,8 @@ from pathlib import Path
 
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
+import numpy as np
+
 from commonize import common_size, sec_client
 
 
@@ -85,6 +87,109 @@ def test_build_income_statement_includes_industry_average():
     cost_of_revenue = next(line for line in lines if line.label == "Cost of revenue")
     # peer percentages: 0.4 and 0.5 -> average 0.45
     assert round(cost_of_revenue.industry_common_size or 0, 4) == 0.45
+    assert cost_of_revenue.industry_stats is not None
+    assert cost_of_revenue.industry_stats.count == 2
+
+
+def test_summarize_peer_ratios_ignores_missing_values():
+    stats = common_size.summarize_peer_ratios(
+        [
+            [1.0, 0.1, None],
+            [1.0, 0.2, None],
+            [1.0, 0.3, None],
+            [1.0, 0.4, None],
+            [1.0, None, None],
+        ]
+    )
+
+    assert [item.count for item in stats] == [5, 4, 0]
+    assert stats[0].mean == 1.0
+    assert round(stats[1].mean, 6) == 0.25
+    assert round(stats[1].median, 6) == 0.25
+    assert round(stats[1].p25, 6) == 0.175
+    assert round(stats[1].p75, 6) == 0.325
+    assert round(stats[1].trimmed_mean, 6) == 0.25
+    assert stats[2].mean is None
+    assert stats[2].median is None
+
+
+def test_build_income_statements_returns_matrix_for_many_companies():
+    companies = [
+        _build_facts({"Revenues": [(100.0, "10-K", "FY")], "CostOfRevenue": [(40.0, "10-K", "FY")]}),
+        _build_facts({"Revenues": [(0.0, "10-K", "FY")]}),
+        _build_facts({"Revenues": [(200.0, "10-K", "FY")], "NetIncomeLoss": [(50.0, "10-K", "FY")]}),
+    ]
+
+    batch = common_size.build_income_statements(companies)
+
+    assert batch.values.shape == (3, len(batch.labels))
+    assert batch.ratios.shape == batch.values.shape
+    assert batch.available.tolist() == [True, False, True]
+    cost_index = batch.labels.index("Cost of revenue")
+    net_index = batch.labels.index("Net income")
+    assert batch.ratios[0, cost_index] == 0.4
+    assert batch.ratios[2, net_index] == 0.25
+    assert np.isnan(batch.ratios[1, 0])
+
+
+def test_income_statement_series_aligns_periods_on_end_date():
+    def fact(value, end, accn):
+        return {"val": value, "end": end, "form": "10-K", "fp": "FY", "accn": accn}
+
+    facts = {
+        "facts": {
+            "us-gaap": {
+                "Revenues": {
+                    "units": {
+                        "USD": [
+                            fact(100.0, "2022-12-31", "0001"),
+                            fact(200.0, "2023-12-31", "0002"),
+                            fact(100.0, "2022-12-31", "0002"),
+                        ]
+                    }
+                },
+                "CostOfRevenue": {
+                    "units": {
+                        "USD": [
+                            fact(30.0, "2022-12-31", "0001"),
+                            fact(60.0, "2023-12-31", "0002"),
+                            fact(35.0, "2022-12-31", "0002"),
+                        ]
+                    }
+                },
+            }
+        }
+    }
+
+    series = common_size.build_income_statement_series(facts, periods=3)
+
+    assert series.periods == ["2023-12-31", "2022-12-31"]
+    assert series.values.shape == (len(series.labels), 2)
+    cost_index = series.labels.index("Cost of revenue")
+    assert series.ratios[0].tolist() == [1.0, 1.0]
+    assert series.ratios[cost_index, 0] == 0.3
+    # The 2022 column keeps the value reported in the original 2022 filing.
+    assert series.values[cost_index, 1] == 30.0
+
+
+def test_compiled_layout_normalises_rows_and_fingerprints():
+    layout = common_size.compile_layout(
+        [("Total", "Assets"), ("Group", None, 0, True), ("Cash", ("Cash", "CashAlt"), 1)]
+    )
+
+    assert [row.tags for row in layout.rows] == [("Assets",), (), ("Cash", "CashAlt")]
+    assert layout.rows[1].is_header is True
+    assert layout.label_index["Cash"] == 2
+    assert layout.tags == {"Assets", "Cash", "CashAlt"}
+    same = common_size.compile_layout(
+        [("Total", "Assets"), ("Group", None, 0, True), ("Cash", ("Cash", "CashAlt"), 1)]
+    )
+    retagged = common_size.compile_layout(
+        [("Total", "Assets"), ("Group", None, 0, True), ("Cash", ("CashAlt", "Cash"), 1)]
+    )
+    assert layout.fingerprint == same.fingerprint
+    assert layout.fingerprint != retagged.fingerprint
+    assert common_size.INCOME_LAYOUT.denominator.label == "Revenue"
 
 
 def test_missing_denominator_raises():
@@ -0,0 +1,51 @@
+import threading
+
+from commonize import db
+
+
+def test_connections_are_per_thread_and_run_schema_once(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    calls = []
+
+    def schema(conn):
+        calls.append(conn)
+        conn.execute("CREATE TABLE IF NOT EXISTS items (value INTEGER)")
+
+    conn = db.connect(path, schema)
+    assert db.connect(path, schema) is conn
+    assert calls == [conn]
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(db.connect(path, schema)))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+    assert len(calls) == 1
+
+
+def test_readers_are_not_blocked_by_open_write(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+
+    def schema(conn):
+        conn.execute("CREATE TABLE IF NOT EXISTS items (value INTEGER)")
+
+    writer = db.connect(path, schema)
+    with db.transaction(writer):
+        writer.execute("INSERT INTO items VALUES (1)")
+
+    seen = []
+    with db.transaction(writer):
+        writer.execute("INSERT INTO items VALUES (2)")
+
+        def read():
+            conn = db.connect(path, schema)
+            with db.transaction(conn, write=False):
+                seen.append(conn.execute("SELECT COUNT(*) FROM items").fetchone()[0])
+            db.close_thread_connections()
+
+        thread = threading.Thread(target=read)
+        thread.start()
+        thread.join(timeout=5)
+    assert seen == [1]
+    assert writer.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 2
@@ -1,4 +1,7 @@
 import importlib
+import sqlite3
+
+import pytest
 
 
 def test_store_and_load(tmp_path, monkeypatch):
@@ -15,3 +18,151 @@ def test_store_and_load(tmp_path, monkeypatch):
     assert result.peer_count == 3
     assert result.ratios == [0.1, None]
     assert result.line_count == 2
+
+
+def test_row_keys_survive_layout_edit(tmp_path, monkeypatch):
+    monkeypatch.setenv("COMMONIZE_CACHE", str(tmp_path))
+
+    module = importlib.import_module("commonize.industry_cache")
+    importlib.reload(module)
+
+    from commonize.common_size import compile_layout
+
+    original = compile_layout([("Revenue", "Revenues"), ("Cost", "CostOfRevenue")])
+    module.store_benchmark(
+        "1234",
+        "income",
+        "annual",
+        [1.0, 0.4],
+        3,
+        line_count=2,
+        row_keys=original.row_keys,
+        layout_fingerprint=original.fingerprint,
+    )
+
+    warm = module.load_benchmark(
+        "1234",
+        "income",
+        "annual",
+        row_keys=original.row_keys,
+        layout_fingerprint=original.fingerprint,
+    )
+    assert warm is not None and warm.complete
+    assert warm.ratios == [1.0, 0.4]
+
+    edited = compile_layout(
+        [
+            ("Revenue", "Revenues"),
+            ("Gross Profit", "GrossProfit"),
+            ("Cost", "CostOfRevenue"),
+        ]
+    )
+    partial = module.load_benchmark(
+        "1234",
+        "income",
+        "annual",
+        row_keys=edited.row_keys,
+        layout_fingerprint=edited.fingerprint,
+    )
+    assert partial is not None
+    assert partial.ratios == [1.0, None, 0.4]
+    assert not partial.complete
+
+    retagged = compile_layout([("Revenue", "SalesRevenueNet"), ("Cost", "CostOfRevenue")])
+    assert retagged.row_keys[0] != original.row_keys[0]
+
+
+def test_memo_serves_hot_benchmarks_and_revalidates(tmp_path, monkeypatch):
+    monkeypatch.setenv("COMMONIZE_CACHE", str(tmp_path))
+
+    module = importlib.import_module("commonize.industry_cache")
+    importlib.reload(module)
+
+    module.store_benchmark("1234", "income", "annual", [1.0, 0.5], 3, line_count=2)
+    first = module.load_benchmark("1234", "income", "annual", expected_line_count=2)
+    assert first.ratios == [1.0, 0.5]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("hot benchmark should be served from memory")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(module, "_read_benchmark", fail)
+        patch.setattr(module, "_stored_updated_at", fail)
+        hot = module.load_benchmark("1234", "income", "annual", expected_line_count=2)
+    assert hot.ratios == [1.0, 0.5]
+
+    # Another process rewrites the row; the entry is revalidated once its TTL lapses.
+    with sqlite3.connect(module.DB_PATH) as conn:
+        conn.execute(
+            "UPDATE industry_benchmarks SET ratios = ?, updated_at = updated_at + 1",
+            ("[1.0, 0.25]",),
+        )
+    assert module.load_benchmark("1234", "income", "annual", expected_line_count=2).ratios == [
+        1.0,
+        0.5,
+    ]
+    monkeypatch.setattr(module._benchmark_memo, "ttl", 0)
+    refreshed = module.load_benchmark("1234", "income", "annual", expected_line_count=2)
+    assert refreshed.ratios == [1.0, 0.25]
+
+    # Writes in this process invalidate the memo immediately.
+    monkeypatch.setattr(module._benchmark_memo, "ttl", 3600)
+    module.store_benchmark("1234", "income", "annual", [1.0, 0.75], 3, line_count=2)
+    assert module.load_benchmark("1234", "income", "annual", expected_line_count=2).ratios == [
+        1.0,
+        0.75,
+    ]
+
+
+def test_expired_benchmark_is_served_stale_on_request(tmp_path, monkeypatch):
+    monkeypatch.setenv("COMMONIZE_CACHE", str(tmp_path))
+
+    module = importlib.import_module("commonize.industry_cache")
+    importlib.reload(module)
+
+    module.store_benchmark("1234", "income", "annual", [1.0, 0.5], 3, line_count=2)
+    with sqlite3.connect(module.DB_PATH) as conn:
+        conn.execute("UPDATE industry_benchmarks SET updated_at = updated_at - 7200")
+    module._benchmark_memo.clear()
+
+    assert module.load_benchmark("1234", "income", "annual", max_age_seconds=3600) is None
+
+    stale = module.load_benchmark(
+        "1234", "income", "annual", max_age_seconds=3600, allow_stale=True
+    )
+    assert stale is not None
+    assert stale.stale
+    assert stale.ratios == [1.0, 0.5]
+    assert stale.age_seconds >= 7200
+
+
+def test_benchmark_requests_are_counted_in_memory_and_flushed(tmp_path, monkeypatch):
+    monkeypatch.setenv("COMMONIZE_CACHE", str(tmp_path))
+
+    module = importlib.import_module("commonize.industry_cache")
+    importlib.reload(module)
+
+    def stored_requests():
+        with module.db.transaction(module._connect(), write=False) as conn:
+            return conn.execute(
+                "SELECT sic, SUM(requests) FROM benchmark_requests GROUP BY sic"
+            ).fetchall()
+
+    for _ in range(3):
+        module.record_benchmark_request("1234", "income", "annual")
+    assert stored_requests() == []  # page views do not write to the database
+
+    # A busy database keeps the counts for the next flush.
+    connect = module._connect
+
+    def busy():
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(module, "_connect", busy)
+    with pytest.raises(sqlite3.OperationalError):
+        module.flush_benchmark_requests()
+    monkeypatch.setattr(module, "_connect", connect)
+
+    module.record_benchmark_request("1234", "income", "annual")
+    module.flush_benchmark_requests()
+    assert stored_requests() == [("1234", 4)]
@@ -1,38 +1,61 @@
 import importlib
+import sqlite3
+import threading
+import time
 
-from commonize.common_size import CommonSizeLine
-from commonize.sec_client import IndustryInfo, TickerInfo
+import pytest
 
+from commonize.common_size import compile_layout
+from commonize.sec_client import IndustryInfo, SECClientError, TickerInfo
 
-def test_enqueue_and_process_job(tmp_path, monkeypatch):
+
+def _peer_facts(revenue, cost, accession):
+    def _fact(value):
+        return {
+            "val": value,
+            "end": "2023-12-31",
+            "form": "10-K",
+            "fp": "FY",
+            "accn": accession,
+        }
+
+    return {
+        "facts": {
+            "us-gaap": {
+                "Revenues": {"units": {"USD": [_fact(revenue)]}},
+                "CostOfRevenue": {"units": {"USD": [_fact(cost)]}},
+            }
+        }
+    }
+
+
+def _reload_modules(tmp_path, monkeypatch):
     monkeypatch.setenv("COMMONIZE_CACHE", str(tmp_path))
 
     cache_module = importlib.import_module("commonize.industry_cache")
     jobs_module = importlib.import_module("commonize.industry_jobs")
     importlib.reload(cache_module)
     jobs_module = importlib.reload(jobs_module)
+    jobs_module._JOB_LAYOUTS["income"] = compile_layout(
+        [("Revenue", "Revenues"), ("Cost of revenue", "CostOfRevenue")]
+    )
+    return cache_module, jobs_module
+
+
+def test_enqueue_and_process_job(tmp_path, monkeypatch):
+    cache_module, jobs_module = _reload_modules(tmp_path, monkeypatch)
 
     info = TickerInfo(ticker="DEMO", cik_str="1234", title="Demo Corp")
     industry = IndustryInfo(sic="5678", description="Demo Industry")
 
-    def fake_builder(facts, *, period="annual", peers=None):
-        line = CommonSizeLine(
-            label="Revenue",
-            value=100.0,
-            common_size=1.0,
-            industry_common_size=None,
-        )
-        if peers:
-            line.industry_common_size = 0.5
-        return [line]
-
-    monkeypatch.setattr(jobs_module, "build_income_statement", fake_builder)
-    jobs_module._JOB_STATEMENTS["income"] = fake_builder
-    monkeypatch.setattr(jobs_module, "fetch_company_facts", lambda cik: {"facts": {}})
     monkeypatch.setattr(
         jobs_module,
         "fetch_peer_company_facts",
-        lambda cik, max_companies=5: (industry, [info], [{"facts": {}}]),
+        lambda cik, max_companies=5, **kwargs: (
+            industry,
+            [info],
+            [_peer_facts(100.0, 50.0, "0001")],
+        ),
     )
 
     jobs_module.enqueue_benchmark_job(
@@ -49,11 +72,494 @@ def test_enqueue_and_process_job(tmp_path, monkeypatch):
 
     jobs_module.process_job(job)
 
-    stored = cache_module.load_benchmark(industry.sic, "income", "annual", expected_line_count=1)
+    stored = cache_module.load_benchmark(industry.sic, "income", "annual", expected_line_count=2)
     assert stored is not None
     assert stored.peer_count == 1
-    assert stored.ratios[0] == 0.5
+    assert stored.ratios == [1.0, 0.5]
 
     refreshed_job = jobs_module.get_job_status(industry.sic, "income", "annual")
     assert refreshed_job is not None
     assert refreshed_job.status == "succeeded"
+
+
+def test_refresh_recomputes_only_changed_peers(tmp_path, monkeypatch):
+    cache_module, jobs_module = _reload_modules(tmp_path, monkeypatch)
+
+    industry = IndustryInfo(sic="5678", description="Demo Industry")
+    alpha = TickerInfo(ticker="ALPHA", cik_str="1", title="Alpha")
+    beta = TickerInfo(ticker="BETA", cik_str="2", title="Beta")
+    filings = {
+        alpha.cik: _peer_facts(100.0, 40.0, "a-2023"),
+        beta.cik: _peer_facts(200.0, 120.0, "b-2023"),
+    }
+    monkeypatch.setattr(
+        jobs_module,
+        "fetch_peer_company_facts",
+        lambda cik, max_companies=5, **kwargs: (
+            industry,
+            [alpha, beta],
+            [filings[alpha.cik], filings[beta.cik]],
+        ),
+    )
+
+    built = []
+    original_batch = jobs_module.build_statement_batch
+
+    def tracking_batch(facts_list, layout, *, period="annual"):
+        facts_list = list(facts_list)
+        built.append(len(facts_list))
+        return original_batch(facts_list, layout, period=period)
+
+    monkeypatch.setattr(jobs_module, "build_statement_batch", tracking_batch)
+
+    def run():
+        jobs_module.enqueue_benchmark_job(
+            alpha, industry, "income", "annual", max_companies=2, force=True
+        )
+        jobs_module.process_job(jobs_module.claim_next_job())
+        return cache_module.load_benchmark(industry.sic, "income", "annual")
+
+    first = run()
+    assert first.ratios == [1.0, 0.5]
+    assert built == [2]
+
+    filings[beta.cik] = _peer_facts(200.0, 80.0, "b-2024")
+    second = run()
+    assert built == [2, 1]
+    assert second.ratios == [1.0, 0.4]
+
+    stored = cache_module.load_peer_ratios(industry.sic, "income", "annual")
+    assert stored[beta.cik].accession == "b-2024"
+    assert stored[alpha.cik].accession == "a-2023"
+
+
+def test_expired_lease_is_reclaimed(tmp_path, monkeypatch):
+    _, jobs_module = _reload_modules(tmp_path, monkeypatch)
+
+    info = TickerInfo(ticker="DEMO", cik_str="1234", title="Demo Corp")
+    industry = IndustryInfo(sic="5678", description="Demo Industry")
+    jobs_module.enqueue_benchmark_job(info, industry, "income", "annual", max_companies=3)
+
+    monkeypatch.setattr(jobs_module, "_LEASE_SECONDS", -1.0)
+    stuck = jobs_module.claim_next_job("worker-a")
+    assert stuck.worker_id == "worker-a"
+
+    monkeypatch.setattr(jobs_module, "_LEASE_SECONDS", 60.0)
+    reclaimed = jobs_module.claim_next_job("worker-b")
+    assert reclaimed is not None
+    assert reclaimed.worker_id == "worker-b"
+    assert reclaimed.attempts == 2
+    assert jobs_module.claim_next_job("worker-c") is None
+
+    # The original worker lost its lease and can neither renew nor finish the job.
+    assert jobs_module.heartbeat(stuck) is False
+    jobs_module._complete_job(stuck, "failed", "stale worker")
+    assert jobs_module.get_job_status(industry.sic, "income", "annual").status == "running"
+
+    assert jobs_module.heartbeat(reclaimed) is True
+    jobs_module._complete_job(reclaimed, "succeeded")
+    assert jobs_module.get_job_status(industry.sic, "income", "annual").status == "succeeded"
+
+
+def test_worker_survives_unexpected_errors(tmp_path, monkeypatch):
+    _, jobs_module = _reload_modules(tmp_path, monkeypatch)
+
+    info = TickerInfo(ticker="DEMO", cik_str="1234", title="Demo Corp")
+    industry = IndustryInfo(sic="5678", description="Demo Industry")
+    other = IndustryInfo(sic="9999", description="Other Industry")
+
+    def truncated(cik, max_companies=5, **kwargs):
+        raise ValueError("Unterminated string")
+
+    monkeypatch.setattr(jobs_module, "fetch_peer_company_facts", truncated)
+    jobs_module.enqueue_benchmark_job(info, industry, "income", "annual", max_companies=3)
+
+    stop = threading.Event()
+    runner = threading.Thread(
+        target=jobs_module.run_workers, args=(stop,), kwargs={"workers": 3, "poll_interval": 0.05}
+    )
+    runner.start()
+    try:
+        deadline = time.monotonic() + 5
+        while jobs_module.get_job_status(industry.sic, "income", "annual").status != "failed":
+            assert time.monotonic() < deadline
+            time.sleep(0.02)
+        assert runner.is_alive()
+
+        # The same workers keep taking new jobs.
+        jobs_module.enqueue_benchmark_job(info, other, "income", "annual", max_companies=3)
+        while jobs_module.get_job_status(other.sic, "income", "annual").status != "failed":
+            assert time.monotonic() < deadline
+            time.sleep(0.02)
+    finally:
+        stop.set()
+        runner.join(5)
+    assert not runner.is_alive()
+    job = jobs_module.get_job_status(industry.sic, "income", "annual")
+    assert (job.attempts, job.error) == (1, "Unterminated string")
+
+
+def test_failure_in_a_group_leaves_finished_siblings_alone(tmp_path, monkeypatch):
+    cache_module, jobs_module = _reload_modules(tmp_path, monkeypatch)
+    jobs_module._JOB_LAYOUTS["balance"] = compile_layout(
+        [("Total assets", "Revenues"), ("Cost", "CostOfRevenue")]
+    )
+
+    info = TickerInfo(ticker="DEMO", cik_str="1234", title="Demo Corp")
+    industry = IndustryInfo(sic="5678", description="Demo Industry")
+    monkeypatch.setattr(
+        jobs_module,
+        "fetch_peer_company_facts",
+        lambda cik, max_companies=5, **kwargs: (
+            industry,
+            [info],
+            [_peer_facts(100.0, 50.0, "0001")],
+        ),
+    )
+    store = jobs_module.store_benchmark
+
+    def locked_for_balance(sic, statement, *args, **kwargs):
+        if statement == "balance":
+            raise sqlite3.OperationalError("database is locked")
+        return store(sic, statement, *args, **kwargs)
+
+    monkeypatch.setattr(jobs_module, "store_benchmark", locked_for_balance)
+    jobs_module.enqueue_benchmark_job(info, industry, "income", "annual", max_companies=1)
+    jobs_module.enqueue_benchmark_job(info, industry, "balance", "annual", max_companies=1)
+
+    jobs = jobs_module.claim_job_group("worker")
+    assert len(jobs) == 2
+    with pytest.raises(sqlite3.OperationalError) as excinfo:
+        jobs_module.process_job_group(jobs)
+    jobs_module._fail_jobs(jobs, excinfo.value)  # as worker_loop does
+
+    income = jobs_module.get_job_status(industry.sic, "income", "annual")
+    balance = jobs_module.get_job_status(industry.sic, "balance", "annual")
+    assert income.status == "succeeded"
+    assert (balance.status, balance.attempts) == ("pending", 1)
+    assert cache_module.load_benchmark(industry.sic, "income", "annual") is not None
+
+
+def test_expired_lease_after_last_attempt_is_dead_lettered(tmp_path, monkeypatch):
+    _, jobs_module = _reload_modules(tmp_path, monkeypatch)
+    for name in ("TRANSIENT_RETRY", "THROTTLE_RETRY"):
+        monkeypatch.setattr(
+            jobs_module,
+            name,
+            jobs_module.RetryPolicy(base_delay=60.0, max_delay=60.0, max_attempts=2),
+        )
+
+    info = TickerInfo(ticker="DEMO", cik_str="1234", title="Demo Corp")
+    industry = IndustryInfo(sic="5678", description="Demo Industry")
+    jobs_module.enqueue_benchmark_job(info, industry, "income", "annual", max_companies=3)
+
+    # Two workers in a row die while holding the job.
+    monkeypatch.setattr(jobs_module, "_LEASE_SECONDS", -1.0)
+    assert jobs_module.claim_next_job("worker-a").attempts == 1
+    assert jobs_module.claim_next_job("worker-b").attempts == 2
+
+    assert jobs_module.claim_next_job("worker-c") is None
+    assert [job.sic for job in jobs_module.list_dead_jobs()] == [industry.sic]
+
+
+def test_enqueue_wakes_idle_worker(tmp_path, monkeypatch):
+    _, jobs_module = _reload_modules(tmp_path, monkeypatch)
+
+    info = TickerInfo(ticker="DEMO", cik_str="1234", title="Demo Corp")
+    industry = IndustryInfo(sic="5678", description="Demo Industry")
+    processed = threading.Event()
+
+    def fake_process(jobs):
+        for job in jobs:
+            jobs_module._complete_job(job, "succeeded")
+        processed.set()
+
+    monkeypatch.setattr(jobs_module, "process_job_group", fake_process)
+
+    stop = threading.Event()
+    worker = threading.Thread(target=jobs_module.worker_loop, args=(stop, 30.0))
+    worker.start()
+    try:
+        time.sleep(0.1)  # let the worker find the queue empty and go idle
+        started = time.monotonic()
+        jobs_module.enqueue_benchmark_job(info, industry, "income", "annual", max_companies=3)
+        assert processed.wait(5)
+        assert time.monotonic() - started < 1.0
+    finally:
+        stop.set()
+        worker.join(5)
+    assert not worker.is_alive()
+
+
+def test_jobs_for_one_industry_share_a_peer_fetch(tmp_path, monkeypatch):
+    cache_module, jobs_module = _reload_modules(tmp_path, monkeypatch)
+    jobs_module._JOB_LAYOUTS["balance"] = compile_layout(
+        [("Total assets", "Revenues"), ("Cost", "CostOfRevenue")]
+    )
+
+    industry = IndustryInfo(sic="5678", description="Demo Industry")
+    other_industry = IndustryInfo(sic="9999", description="Other Industry")
+    alpha = TickerInfo(ticker="ALPHA", cik_str="1", title="Alpha")
+    beta = TickerInfo(ticker="BETA", cik_str="2", title="Beta")
+
+    fetches = []
+
+    def fake_fetch(cik, max_companies=5, **kwargs):
+        fetches.append(max_companies)
+        facts = [_peer_facts(100.0, 40.0, "a"), _peer_facts(100.0, 60.0, "b")]
+        return industry, [alpha, beta][:max_companies], facts[:max_companies]
+
+    monkeypatch.setattr(jobs_module, "fetch_peer_company_facts", fake_fetch)
+
+    jobs_module.enqueue_benchmark_job(alpha, industry, "income", "annual", max_companies=1)
+    jobs_module.enqueue_benchmark_job(alpha, other_industry, "income", "annual", max_companies=1)
+    jobs_module.enqueue_benchmark_job(alpha, industry, "balance", "annual", max_companies=2)
+
+    jobs = jobs_module.claim_job_group("worker-a")
+    assert [(job.sic, job.statement) for job in jobs] == [("5678", "income"), ("5678", "balance")]
+
+    jobs_module.process_job_group(jobs)
+    assert fetches == [2]
+
+    income = cache_module.load_benchmark("5678", "income", "annual")
+    balance = cache_module.load_benchmark("5678", "balance", "annual")
+    assert (income.peer_count, income.ratios) == (1, [1.0, 0.4])
+    assert (balance.peer_count, balance.ratios) == (2, [1.0, 0.5])
+    assert jobs_module.get_job_status("9999", "income", "annual").status == "pending"
+
+
+def test_claims_follow_priority_lanes_with_aging(tmp_path, monkeypatch):
+    _, jobs_module = _reload_modules(tmp_path, monkeypatch)
+
+    info = TickerInfo(ticker="DEMO", cik_str="1234", title="Demo Corp")
+
+    def enqueue(sic, priority):
+        jobs_module.enqueue_benchmark_job(
+            info,
+            IndustryInfo(sic=sic, description=None),
+            "income",
+            "annual",
+            max_companies=1,
+            priority=priority,
+        )
+
+    enqueue("100", jobs_module.PRIORITY_BACKGROUND)
+    enqueue("200", jobs_module.PRIORITY_BACKGROUND)
+    enqueue("300", jobs_module.PRIORITY_INTERACTIVE)
+    enqueue("400", jobs_module.PRIORITY_CLI)
+    # Re-enqueueing from a more urgent lane upgrades the pending job.
+    enqueue("200", jobs_module.PRIORITY_INTERACTIVE)
+
+    claimed = [jobs_module.claim_next_job("worker").sic for _ in range(4)]
+    assert claimed == ["200", "300", "400", "100"]
+
+    # A background job that waited through the aging period overtakes newer CLI work.
+    monkeypatch.setattr(jobs_module, "_PRIORITY_AGING_SECONDS", 0.01)
+    enqueue("500", jobs_module.PRIORITY_BACKGROUND)
+    time.sleep(0.05)
+    enqueue("600", jobs_module.PRIORITY_CLI)
+    job = jobs_module.claim_next_job("worker")
+    assert (job.sic, job.priority) == ("500", jobs_module.PRIORITY_CLI)
+
+
+def test_aged_background_work_never_overtakes_interactive_jobs(tmp_path, monkeypatch):
+    _, jobs_module = _reload_modules(tmp_path, monkeypatch)
+
+    info = TickerInfo(ticker="DEMO", cik_str="1234", title="Demo Corp")
+
+    def enqueue(sic, priority, force=False):
+        jobs_module.enqueue_benchmark_job(
+            info,
+            IndustryInfo(sic=sic, description=None),
+            "income",
+            "annual",
+            max_companies=1,
+            force=force,
+            priority=priority,
+        )
+
+    for sic in ("b0", "b1", "b2", "b3", "b4"):
+        enqueue(sic, jobs_module.PRIORITY_BACKGROUND)
+    assert jobs_module.claim_next_job("worker").sic == "b0"
+
+    start = time.time()
+    monkeypatch.setattr(jobs_module.time, "time", lambda: start + 130)
+    assert jobs_module.claim_next_job("worker").sic == "b1"
+    enqueue("LIVE", jobs_module.PRIORITY_INTERACTIVE)
+    # A forced background refresh of a pending job keeps it in its lane.
+    enqueue("LIVE", jobs_module.PRIORITY_BACKGROUND, force=True)
+
+    claimed = [jobs_module.claim_next_job("worker") for _ in range(4)]
+    assert [job.sic for job in claimed] == ["LIVE", "b2", "b3", "b4"]
+    assert claimed[0].priority == jobs_module.PRIORITY_INTERACTIVE
+    assert all(job.priority == jobs_module.PRIORITY_CLI for job in claimed[1:])
+
+
+def test_transient_failures_back_off_then_dead_letter(tmp_path, monkeypatch):
+    _, jobs_module = _reload_modules(tmp_path, monkeypatch)
+    monkeypatch.setattr(
+        jobs_module,
+        "TRANSIENT_RETRY",
+        jobs_module.RetryPolicy(base_delay=60.0, max_delay=60.0, max_attempts=2),
+    )
+
+    info = TickerInfo(ticker="DEMO", cik_str="1234", title="Demo Corp")
+    industry = IndustryInfo(sic="5678", description="Demo Industry")
+
+    def unavailable(cik, max_companies=5, **kwargs):
+        raise SECClientError("SEC request failed with status 503", status_code=503)
+
+    monkeypatch.setattr(jobs_module, "fetch_peer_company_facts", unavailable)
+    jobs_module.enqueue_benchmark_job(info, industry, "income", "annual", max_companies=3)
+
+    jobs_module.process_job(jobs_module.claim_next_job("worker"))
+    job = jobs_module.get_job_status(industry.sic, "income", "annual")
+    assert job.status == "pending"
+    assert 30.0 <= job.not_before - time.time() <= 60.0
+    assert jobs_module.claim_next_job("worker") is None  # still backing off
+
+    monkeypatch.setattr(jobs_module.time, "time", lambda: job.not_before + 1)
+    jobs_module.process_job(jobs_module.claim_next_job("worker"))
+    assert [dead.sic for dead in jobs_module.list_dead_jobs()] == [industry.sic]
+
+    assert jobs_module.requeue_dead_jobs() == 1
+    requeued = jobs_module.get_job_status(industry.sic, "income", "annual")
+    assert (requeued.status, requeued.attempts) == ("pending", 0)
+
+
+def test_throttled_peer_downloads_are_retried(tmp_path, monkeypatch):
+    _, jobs_module = _reload_modules(tmp_path, monkeypatch)
+    sec_client = importlib.import_module("commonize.sec_client")
+
+    info = TickerInfo(ticker="DEMO", cik_str="1234", title="Demo Corp")
+    industry = IndustryInfo(sic="5678", description="Demo Industry")
+    peer = TickerInfo(ticker="PEER", cik_str="99", title="Peer Corp")
+    monkeypatch.setattr(
+        sec_client,
+        "find_industry_peers",
+        lambda cik, max_companies=5, candidate_pool=None: (industry, [peer]),
+    )
+
+    def throttled(cik, **kwargs):
+        raise SECClientError("SEC request failed with status 429", status_code=429)
+
+    monkeypatch.setattr(sec_client, "fetch_company_facts", throttled)
+    jobs_module.enqueue_benchmark_job(info, industry, "income", "annual", max_companies=3)
+    jobs_module.process_job(jobs_module.claim_next_job("worker"))
+
+    job = jobs_module.get_job_status(industry.sic, "income", "annual")
+    assert (job.status, job.attempts) == ("pending", 1)
+    assert job.not_before > time.time()
+
+    # Forcing a refresh neither skips the backoff nor resets the attempt count.
+    jobs_module.enqueue_benchmark_job(
+        info, industry, "income", "annual", max_companies=3, force=True
+    )
+    forced = jobs_module.get_job_status(industry.sic, "income", "annual")
+    assert (forced.attempts, forced.not_before) == (1, job.not_before)
+    assert jobs_module.claim_next_job("worker") is None
+
+
+def test_throttling_has_its_own_retry_policy(tmp_path, monkeypatch):
+    _, jobs_module = _reload_modules(tmp_path, monkeypatch)
+
+    def policy(exc):
+        return jobs_module._retry_policy(exc)
+
+    assert policy(SECClientError("throttled", status_code=429)) is jobs_module.THROTTLE_RETRY
+    assert policy(SECClientError("outage", status_code=503)) is jobs_module.TRANSIENT_RETRY
+    assert policy(SECClientError("network")) is jobs_module.TRANSIENT_RETRY
+    assert policy(sqlite3.OperationalError("database is locked")) is jobs_module.TRANSIENT_RETRY
+    assert policy(SECClientError("missing", status_code=404)) is None
+    assert jobs_module.THROTTLE_RETRY.base_delay > jobs_module.TRANSIENT_RETRY.base_delay
+
+
+def test_permanent_failures_are_not_retried(tmp_path, monkeypatch):
+    _, jobs_module = _reload_modules(tmp_path, monkeypatch)
+
+    info = TickerInfo(ticker="DEMO", cik_str="1234", title="Demo Corp")
+    industry = IndustryInfo(sic="5678", description="Demo Industry")
+
+    def not_found(cik, max_companies=5, **kwargs):
+        raise SECClientError("SEC request failed with status 404", status_code=404)
+
+    monkeypatch.setattr(jobs_module, "fetch_peer_company_facts", not_found)
+    jobs_module.enqueue_benchmark_job(info, industry, "income", "annual", max_companies=3)
+    jobs_module.process_job(jobs_module.claim_next_job("worker"))
+
+    assert jobs_module.get_job_status(industry.sic, "income", "annual").status == "failed"
+
+
+def test_scheduler_requeues_popular_benchmarks_before_expiry(tmp_path, monkeypatch):
+    cache_module, jobs_module = _reload_modules(tmp_path, monkeypatch)
+
+    info = TickerInfo(ticker="DEMO", cik_str="1234", title="Demo Corp")
+    for sic in ("100", "200", "300", "400"):
+        industry = IndustryInfo(sic=sic, description=None)
+        monkeypatch.setattr(
+            jobs_module,
+            "fetch_peer_company_facts",
+            lambda cik, max_companies=5, industry=industry, **kwargs: (
+                industry,
+                [info],
+                [_peer_facts(100.0, 50.0, "0001")],
+            ),
+        )
+        jobs_module.enqueue_benchmark_job(info, industry, "income", "annual", max_companies=3)
+        jobs_module.process_job(jobs_module.claim_next_job("worker"))
+
+    for sic, requests in (("100", 1), ("200", 3), ("400", 2)):
+        for _ in range(requests):
+            cache_module.record_benchmark_request(sic, "income", "annual")
+    # A refresh already queued by a page view is left alone.
+    jobs_module.enqueue_benchmark_job(
+        info, IndustryInfo(sic="400", description=None), "income", "annual",
+        max_companies=3, force=True, priority=jobs_module.PRIORITY_INTERACTIVE,
+    )
+
+    # Nothing is close to expiring yet.
+    assert jobs_module.schedule_refreshes(horizon_seconds=60.0) == 0
+
+    horizon = cache_module.DEFAULT_TTL_SECONDS + 60.0
+    assert jobs_module.schedule_refreshes(limit=1, horizon_seconds=horizon) == 1
+    assert jobs_module.get_job_status("200", "income", "annual").status == "pending"
+    assert jobs_module.get_job_status("100", "income", "annual").status == "succeeded"
+
+    assert jobs_module.schedule_refreshes(horizon_seconds=horizon) == 1
+    refreshed = jobs_module.get_job_status("100", "income", "annual")
+    assert (refreshed.status, refreshed.priority) == ("pending", jobs_module.PRIORITY_BACKGROUND)
+    # Never requested, so never refreshed ahead of time.
+    assert jobs_module.get_job_status("300", "income", "annual").status == "succeeded"
+    assert jobs_module.get_job_status("400", "income", "annual").priority == (
+        jobs_module.PRIORITY_INTERACTIVE
+    )
+
+
+def test_scheduler_waits_out_the_cooldown_after_a_failed_refresh(tmp_path, monkeypatch):
+    cache_module, jobs_module = _reload_modules(tmp_path, monkeypatch)
+
+    info = TickerInfo(ticker="DEMO", cik_str="1234", title="Demo Corp")
+    industry = IndustryInfo(sic="100", description=None)
+    peers = [[_peer_facts(100.0, 50.0, "0001")]]
+    monkeypatch.setattr(
+        jobs_module,
+        "fetch_peer_company_facts",
+        lambda cik, max_companies=5, **kwargs: (industry, [info][: len(peers[0])], peers[0]),
+    )
+    jobs_module.enqueue_benchmark_job(info, industry, "income", "annual", max_companies=3)
+    jobs_module.process_job(jobs_module.claim_next_job("worker"))
+    cache_module.record_benchmark_request(industry.sic, "income", "annual")
+    horizon = cache_module.DEFAULT_TTL_SECONDS + 60.0
+
+    # The refresh finds no peers and fails for good.
+    peers[0] = []
+    assert jobs_module.schedule_refreshes(horizon_seconds=horizon) == 1
+    jobs_module.process_job(jobs_module.claim_next_job("worker"))
+    failed = jobs_module.get_job_status(industry.sic, "income", "annual")
+    assert failed.status == "failed"
+
+    assert jobs_module.schedule_refreshes(horizon_seconds=horizon) == 0
+
+    later = failed.finished_at + jobs_module.FAILED_REFRESH_COOLDOWN + 1
+    monkeypatch.setattr(jobs_module.time, "time", lambda: later)
+    assert jobs_module.schedule_refreshes(horizon_seconds=horizon) == 1
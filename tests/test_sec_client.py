@@ -1,3 +1,9 @@
+import io
+import json
+import os
+
+import pytest
+
 from commonize import sec_client
 
 
@@ -88,3 +94,404 @@ def test_select_fact_falls_back_when_no_reference_match():
     assert fact is not None
     # No match on the reference data, so the latest fact should be returned.
     assert fact.get("end") == "2023-12-31"
+
+
+class _FakeResponse:
+    def __init__(self, payload, status_code=200, headers=None):
+        self._payload = payload
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = json.dumps(payload).encode("utf-8")
+
+    def json(self):
+        return self._payload
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start : start + chunk_size]
+
+    def close(self):
+        pass
+
+
+class _FakeSession:
+    def __init__(self, payloads):
+        self.payloads = payloads
+        self.urls = []
+        self.request_headers = []
+        self.streamed = []
+
+    def get(self, url, headers=None, stream=False, **kwargs):
+        self.urls.append(url)
+        self.request_headers.append(headers or {})
+        self.streamed.append(stream)
+        payload = self.payloads[url]
+        if callable(payload):
+            return payload(headers or {})
+        return _FakeResponse(payload)
+
+
+def test_requests_share_pooled_session(tmp_path, monkeypatch):
+    facts_url = "https://data.sec.gov/api/xbrl/companyfacts/CIK0000000042.json"
+    submissions_url = "https://data.sec.gov/submissions/CIK0000000042.json"
+    session = _FakeSession({facts_url: {"facts": {}}, submissions_url: {"sic": "1000"}})
+    created = []
+
+    def fake_create_session(pool_size):
+        created.append(pool_size)
+        return session
+
+    monkeypatch.setattr(sec_client, "_session", None)
+    monkeypatch.setattr(sec_client, "_create_session", fake_create_session)
+    monkeypatch.setattr(sec_client, "_FACTS_CACHE_DIR", tmp_path)
+    monkeypatch.setattr(sec_client, "_rate_limiter", sec_client.RateLimiter(10, 10))
+
+    assert sec_client.fetch_company_facts("42") == {"facts": {}}
+    assert sec_client.fetch_company_submissions("42") == {"sic": "1000"}
+
+    assert len(created) == 1
+    assert session.urls == [facts_url, submissions_url]
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_rate_limiter_only_blocks_when_budget_exhausted():
+    clock = _FakeClock()
+    limiter = sec_client.RateLimiter(10, 2, clock=clock.time, sleeper=clock.sleep)
+
+    limiter.acquire()
+    limiter.acquire()
+    assert clock.sleeps == []
+
+    limiter.acquire()
+    assert len(clock.sleeps) == 1
+    assert abs(clock.sleeps[0] - 0.1) < 1e-9
+
+
+def test_rate_limiter_shares_budget_through_state_file(tmp_path):
+    clock = _FakeClock()
+    state = tmp_path / "rate.json"
+    first = sec_client.RateLimiter(10, 1, state_path=state, clock=clock.time, sleeper=clock.sleep)
+    second = sec_client.RateLimiter(10, 1, state_path=state, clock=clock.time, sleeper=clock.sleep)
+
+    first.acquire()
+    second.acquire()
+
+    assert len(clock.sleeps) == 1
+
+
+def test_budget_limiter_never_exceeds_limit_in_any_second():
+    for burst in (1, 5, 10, 50):
+        clock = _FakeClock()
+        limiter = sec_client._budget_limiter(10, burst, clock=clock.time, sleeper=clock.sleep)
+        sent = []
+        for _ in range(60):
+            limiter.acquire()
+            sent.append(clock.now)
+
+        for start in sent:
+            in_window = [moment for moment in sent if start <= moment < start + 1.0 - 1e-9]
+            assert len(in_window) <= 10, burst
+
+
+def test_fetch_peer_company_facts_fetches_concurrently_until_enough(monkeypatch):
+    peers = [
+        sec_client.TickerInfo(ticker=f"P{idx}", cik_str=str(idx), title=f"Peer {idx}")
+        for idx in range(1, 8)
+    ]
+    industry = sec_client.IndustryInfo(sic="1000", description="Demo")
+    monkeypatch.setattr(
+        sec_client,
+        "find_industry_peers",
+        lambda cik, max_companies=5, candidate_pool=None: (industry, peers),
+    )
+    requested = []
+
+    def fake_fetch(cik, **kwargs):
+        requested.append(cik)
+        if cik.endswith("2"):
+            raise sec_client.SECClientError("missing")
+        return {"cik": cik}
+
+    monkeypatch.setattr(sec_client, "fetch_company_facts", fake_fetch)
+
+    result_industry, found, facts = sec_client.fetch_peer_company_facts(
+        "42", max_companies=3, concurrency=3
+    )
+
+    assert result_industry is industry
+    assert [peer.ticker for peer in found] == ["P1", "P3", "P4"]
+    assert [item["cik"] for item in facts] == [peer.cik for peer in found]
+    assert len(requested) == 4
+
+
+def test_fetch_peer_company_facts_raises_when_every_peer_is_throttled(monkeypatch):
+    peers = [
+        sec_client.TickerInfo(ticker=f"P{idx}", cik_str=str(idx), title=f"Peer {idx}")
+        for idx in range(1, 4)
+    ]
+    industry = sec_client.IndustryInfo(sic="1000", description="Demo")
+    monkeypatch.setattr(
+        sec_client,
+        "find_industry_peers",
+        lambda cik, max_companies=5, candidate_pool=None: (industry, peers),
+    )
+    status = {"code": 429}
+
+    def failing_fetch(cik, **kwargs):
+        raise sec_client.SECClientError("failed", status_code=status["code"])
+
+    monkeypatch.setattr(sec_client, "fetch_company_facts", failing_fetch)
+
+    with pytest.raises(sec_client.SECClientError) as excinfo:
+        sec_client.fetch_peer_company_facts("42", max_companies=2)
+    assert excinfo.value.retryable
+
+    # Permanent failures still just leave the industry without peers.
+    status["code"] = 404
+    assert sec_client.fetch_peer_company_facts("42", max_companies=2) == (industry, [], [])
+
+
+def test_company_facts_cache_revalidates_with_etag(tmp_path, monkeypatch):
+    url = "https://data.sec.gov/api/xbrl/companyfacts/CIK0000000042.json"
+
+    def respond(headers):
+        if headers.get("If-None-Match") == '"v1"':
+            return _FakeResponse(None, status_code=304)
+        return _FakeResponse({"facts": {"v": 1}}, headers={"ETag": '"v1"'})
+
+    session = _FakeSession({url: respond})
+    monkeypatch.setattr(sec_client, "_session", session)
+    monkeypatch.setattr(sec_client, "_rate_limiter", sec_client.RateLimiter(0, 1))
+    monkeypatch.setattr(sec_client, "_FACTS_CACHE_DIR", tmp_path)
+
+    first = sec_client.fetch_company_facts("42")
+    fresh = sec_client.fetch_company_facts("42")
+    revalidated = sec_client.fetch_company_facts("42", max_age=0)
+
+    assert first == fresh == revalidated == {"facts": {"v": 1}}
+    assert len(session.urls) == 2
+    assert session.request_headers[1]["If-None-Match"] == '"v1"'
+    assert (tmp_path / "CIK0000000042.json.gz").exists()
+
+
+def test_find_industry_peers_uses_sic_index(tmp_path, monkeypatch):
+    sic_file = tmp_path / "cik_sic_map.json"
+    sic_file.write_text(
+        json.dumps(
+            {
+                "0000000001": {"sic": "1000", "sic_description": "Mining"},
+                "0000000002": {"sic": "2000", "sic_description": "Food"},
+                "0000000003": {"sic": "1000", "sic_description": "Mining"},
+            }
+        )
+    )
+    monkeypatch.setattr(sec_client, "_SIC_CACHE_FILE", sic_file)
+    monkeypatch.setattr(sec_client, "_SIC_DB_FILE", tmp_path / "cache.sqlite3")
+    mapping = {
+        ticker: sec_client.TickerInfo(ticker=ticker, cik_str=cik, title=ticker)
+        for ticker, cik in (("AAA", "1"), ("BBB", "2"), ("CCC", "3"))
+    }
+    ticker_index = sec_client._TickerIndex(mapping, None)
+    monkeypatch.setattr(sec_client, "_get_ticker_index", lambda force_refresh=False: ticker_index)
+    monkeypatch.setattr(
+        sec_client,
+        "resolve_cik",
+        lambda value, force_refresh=False: mapping.get(value)
+        or sec_client.TickerInfo(ticker=value, cik_str=value, title=""),
+    )
+
+    def fail_submissions(cik):
+        raise AssertionError("known peers should not trigger submissions requests")
+
+    monkeypatch.setattr(sec_client, "fetch_company_submissions", fail_submissions)
+
+    industry, peers = sec_client.find_industry_peers("AAA", max_companies=1, candidate_pool=1)
+
+    assert industry.sic == "1000"
+    assert [peer.ticker for peer in peers] == ["CCC"]
+
+
+def test_find_industry_peers_looks_up_only_unknown_tickers(tmp_path, monkeypatch):
+    monkeypatch.setattr(sec_client, "_SIC_CACHE_FILE", tmp_path / "missing.json")
+    monkeypatch.setattr(sec_client, "_SIC_DB_FILE", tmp_path / "cache.sqlite3")
+    monkeypatch.setattr(sec_client, "_CIK_BATCH_SIZE", 2)
+    sec_client.store_company_industries(
+        {
+            "1": {"sic": "1000", "sic_description": "Mining"},
+            "2": {"sic": "2000", "sic_description": "Food"},
+            "3": {"sic": "1000", "sic_description": "Mining"},
+            "99": {"sic": "1000", "sic_description": "Mining"},  # no ticker
+        }
+    )
+    mapping = {
+        ticker: sec_client.TickerInfo(ticker=ticker, cik_str=cik, title=ticker)
+        for ticker, cik in (("AAA", "1"), ("BBB", "2"), ("CCC", "3"))
+    }
+    monkeypatch.setattr(
+        sec_client,
+        "_get_ticker_index",
+        lambda force_refresh=False: sec_client._TickerIndex(mapping, None),
+    )
+    monkeypatch.setattr(
+        sec_client,
+        "resolve_cik",
+        lambda value, force_refresh=False: mapping.get(value)
+        or sec_client.TickerInfo(ticker=value, cik_str=value, title=""),
+    )
+    requested = []
+
+    def fake_submissions(cik):
+        requested.append(cik)
+        return {"sic": "1000", "sicDescription": "Mining"}
+
+    monkeypatch.setattr(sec_client, "fetch_company_submissions", fake_submissions)
+
+    # Every ticker is already stored, so the short pool triggers no lookups.
+    _, peers = sec_client.find_industry_peers("AAA", max_companies=1, candidate_pool=10)
+    assert [peer.ticker for peer in peers] == ["CCC"]
+    assert requested == []
+
+    mapping["DDD"] = sec_client.TickerInfo(ticker="DDD", cik_str="4", title="DDD")
+    _, peers = sec_client.find_industry_peers("AAA", max_companies=1, candidate_pool=10)
+    assert [peer.ticker for peer in peers] == ["CCC", "DDD"]
+    assert requested == ["0000000004"]
+
+
+def test_company_industries_upsert_single_keys(tmp_path, monkeypatch):
+    monkeypatch.setattr(sec_client, "_SIC_CACHE_FILE", tmp_path / "missing.json")
+    monkeypatch.setattr(sec_client, "_SIC_DB_FILE", tmp_path / "cache.sqlite3")
+
+    sec_client.store_company_industries({"7": {"sic": "1000", "sic_description": "Old"}})
+    sec_client.store_company_industries({"7": {"sic": "2000", "sic_description": "New"}})
+
+    assert sec_client._lookup_industry("0000000007") == {"sic": "2000", "sic_description": "New"}
+    assert sec_client._ciks_for_sic("1000") == []
+    assert sec_client._ciks_for_sic("2000") == ["0000000007"]
+
+
+def test_ticker_map_is_parsed_once_until_file_changes(tmp_path, monkeypatch):
+    ticker_file = tmp_path / "ticker_cik_map.json"
+    ticker_file.write_text(
+        json.dumps({"DEMO": {"ticker": "DEMO", "cik_str": "42", "title": "Demo Corp"}})
+    )
+    monkeypatch.setattr(sec_client, "_TICKER_CACHE_FILE", ticker_file)
+    monkeypatch.setattr(sec_client, "_ticker_index", None)
+    loads = []
+    original_load = sec_client._load_ticker_cache
+
+    def counting_load():
+        loads.append(1)
+        return original_load()
+
+    monkeypatch.setattr(sec_client, "_load_ticker_cache", counting_load)
+
+    assert sec_client.resolve_cik("demo").cik == "0000000042"
+    assert sec_client.resolve_cik("DEMO").title == "Demo Corp"
+    assert len(loads) == 1
+
+    ticker_file.write_text(
+        json.dumps({"DEMO": {"ticker": "DEMO", "cik_str": "43", "title": "Demo Corp"}})
+    )
+    os.utime(ticker_file, (1, 1))
+
+    assert sec_client.resolve_cik("DEMO").cik == "0000000043"
+    assert len(loads) == 2
+
+
+def test_parse_company_facts_keeps_only_requested_tags():
+    document = {
+        "cik": 42,
+        "facts": {
+            "dei": {"EntityCommonStockSharesOutstanding": {"units": {}}},
+            "us-gaap": {
+                "Revenues": {"units": {"USD": [{"val": 100.5, "end": "2023-12-31"}]}},
+                "Unused": {"units": {"USD": [{"val": 1, "end": "2023-12-31"}]}},
+            },
+        },
+    }
+    source = io.BytesIO(json.dumps(document).encode("utf-8"))
+
+    parsed = sec_client.parse_company_facts(source, frozenset({"Revenues", "Missing"}))
+
+    assert parsed == {
+        "facts": {
+            "us-gaap": {
+                "Revenues": {"units": {"USD": [{"val": 100.5, "end": "2023-12-31"}]}},
+            }
+        }
+    }
+
+
+def test_parse_company_facts_stops_after_us_gaap():
+    head = json.dumps(
+        {"facts": {"us-gaap": {"Unused": {"units": {}}, "Revenues": {"units": {"USD": [1]}}}}}
+    )
+    # Nothing after the us-gaap section is read, so a broken tail is harmless.
+    source = io.BytesIO(head[:-2].encode("utf-8") + b', "srt": {"broken')
+
+    parsed = sec_client.parse_company_facts(source, frozenset({"Revenues"}))
+
+    assert parsed == {"facts": {"us-gaap": {"Revenues": {"units": {"USD": [1]}}}}}
+
+
+def test_fetch_company_facts_streams_body_into_cache(tmp_path, monkeypatch):
+    url = "https://data.sec.gov/api/xbrl/companyfacts/CIK0000000042.json"
+    document = {
+        "facts": {
+            "us-gaap": {"Revenues": {"units": {"USD": [1]}}, "Unused": {"units": {}}},
+            "dei": {"Shares": {"units": {}}},
+        }
+    }
+    session = _FakeSession({url: document})
+    monkeypatch.setattr(sec_client, "_session", session)
+    monkeypatch.setattr(sec_client, "_rate_limiter", sec_client.RateLimiter(0, 1))
+    monkeypatch.setattr(sec_client, "_FACTS_CACHE_DIR", tmp_path)
+    monkeypatch.setattr(sec_client, "_STREAM_CHUNK_SIZE", 7)
+
+    facts = sec_client.fetch_company_facts("42", tags=frozenset({"Revenues"}))
+
+    assert facts == {"facts": {"us-gaap": {"Revenues": {"units": {"USD": [1]}}}}}
+    # The whole document is cached, including the parts the parser skipped.
+    assert sec_client.fetch_company_facts("42") == document
+    assert session.streamed == [True]
+
+
+def test_fact_index_orders_by_end_date_and_indexes_accessions():
+    facts = {
+        "facts": {
+            "us-gaap": {
+                "Metric": {
+                    "units": {
+                        "USD": [
+                            {"val": 1.0, "end": "2021-12-31", "form": "10-K", "fp": "FY", "accn": "A"},
+                            {"val": 3.0, "end": "2023-12-31", "form": "10-K", "fp": "FY", "accn": "C"},
+                            {"val": 2.0, "end": "2022-12-31", "form": "10-K", "fp": "FY", "accn": "B"},
+                            {"val": 9.0, "end": "2024-03-31", "form": "10-Q", "fp": "Q1", "accn": "D"},
+                            {"val": 0.0, "end": "not-a-date", "form": "10-K", "fp": "FY"},
+                        ]
+                    }
+                }
+            }
+        }
+    }
+
+    index = sec_client.FactIndex(facts)
+
+    assert [fact["val"] for _, fact in index.entries("Metric")] == [3.0, 2.0, 1.0]
+    assert index.select("Metric")["accn"] == "C"
+    assert index.select("Metric", reference={"accn": "B"})["val"] == 2.0
+    assert index.select("Metric", period="quarterly")["accn"] == "D"
+    assert sec_client.index_facts(index) is index
+    assert index.select("Missing") is None
@@ -1,14 +1,16 @@
 import sys
+import time
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
+import numpy as np
 from fastapi.testclient import TestClient
 
-from commonize.common_size import CommonSizeLine, StatementNotAvailableError
+from commonize.common_size import CommonSizeLine, StatementNotAvailableError, StatementSeries
 from commonize.industry_cache import IndustryBenchmark
 from commonize.industry_jobs import BenchmarkJob
-from commonize.sec_client import IndustryInfo, TickerInfo
+from commonize.sec_client import FactIndex, IndustryInfo, TickerInfo
 from commonize import web
 
 
@@ -25,10 +27,11 @@ def _setup_common_mocks(monkeypatch):
     monkeypatch.setattr(web, "fetch_company_facts", lambda cik: {"facts": {}})
     industry = IndustryInfo(sic="1234", description="Demo Industry")
     monkeypatch.setattr(web, "get_company_industry", lambda cik: industry)
+    monkeypatch.setattr(web, "record_benchmark_request", lambda *args: None)
     monkeypatch.setattr(
         web,
         "load_benchmark",
-        lambda sic, statement, period, expected_line_count=None: None,
+        lambda sic, statement, period, **kwargs: None,
     )
     monkeypatch.setattr(web, "enqueue_benchmark_job", lambda *args, **kwargs: None)
     monkeypatch.setattr(web, "get_job_status", lambda *args, **kwargs: None)
@@ -52,12 +55,13 @@ def test_cached_industry_skips_peer_fetch(monkeypatch):
     monkeypatch.setattr(web, "resolve_cik", lambda ticker: info)
     monkeypatch.setattr(web, "fetch_company_facts", lambda cik: {"facts": {}})
     monkeypatch.setattr(web, "get_company_industry", lambda cik: industry)
+    monkeypatch.setattr(web, "record_benchmark_request", lambda *args: None)
 
     benchmark = IndustryBenchmark(ratios=[1.0, 0.25], peer_count=3, line_count=2, updated_at=0.0)
     monkeypatch.setattr(
         web,
         "load_benchmark",
-        lambda sic, statement, period, expected_line_count=None: benchmark,
+        lambda sic, statement, period, **kwargs: benchmark,
     )
     def fail_enqueue(*args, **kwargs):
         raise AssertionError("should not enqueue job when cache is warm")
@@ -76,6 +80,76 @@ def test_cached_industry_skips_peer_fetch(monkeypatch):
     assert response.status_code == 200
     assert "derived from 3 peers" in response.text
 
+def test_stale_benchmark_is_served_while_refreshing(monkeypatch):
+    _setup_common_mocks(monkeypatch)
+
+    stale = IndustryBenchmark(
+        ratios=[1.0, 0.25],
+        peer_count=3,
+        line_count=2,
+        updated_at=time.time() - 3 * 86_400,
+        stale=True,
+    )
+    loads = []
+
+    def fake_load(sic, statement, period, **kwargs):
+        loads.append(kwargs)
+        return stale
+
+    enqueued = []
+    monkeypatch.setattr(web, "load_benchmark", fake_load)
+    monkeypatch.setattr(
+        web, "enqueue_benchmark_job", lambda *args, **kwargs: enqueued.append(kwargs)
+    )
+
+    client = TestClient(web.create_app())
+    response = client.get("/", params={"ticker": "demo", "statement": "income", "period": "annual"})
+
+    assert response.status_code == 200
+    assert loads[0]["allow_stale"] is True
+    assert "derived from 3 peers" in response.text
+    assert "computed 3 days ago" in response.text
+    assert enqueued and enqueued[0]["force"] is True
+
+
+def test_failed_refresh_waits_for_cooldown(monkeypatch):
+    info = _setup_common_mocks(monkeypatch)
+
+    stale = IndustryBenchmark(
+        ratios=[1.0, 0.25], peer_count=3, line_count=2, updated_at=0.0, stale=True
+    )
+    monkeypatch.setattr(web, "load_benchmark", lambda *args, **kwargs: stale)
+    failed_job = BenchmarkJob(
+        sic="1234",
+        statement="income",
+        period="annual",
+        max_companies=5,
+        subject_cik=info.cik,
+        subject_ticker=info.ticker,
+        subject_title=info.title,
+        status="failed",
+        queued_at=0.0,
+        started_at=None,
+        finished_at=time.time(),
+        attempts=1,
+        error="No peer filings available",
+    )
+    enqueued = []
+    monkeypatch.setattr(
+        web, "enqueue_benchmark_job", lambda *args, **kwargs: enqueued.append(kwargs)
+    )
+    monkeypatch.setattr(web, "get_job_status", lambda *args, **kwargs: failed_job)
+
+    client = TestClient(web.create_app())
+    params = {"ticker": "demo", "statement": "income", "period": "annual"}
+    assert client.get("/", params=params).status_code == 200
+    assert enqueued == []
+
+    failed_job.finished_at = time.time() - web.FAILED_REFRESH_COOLDOWN - 1
+    assert client.get("/", params=params).status_code == 200
+    assert len(enqueued) == 1
+
+
 def test_index_shows_pending_job(monkeypatch):
     info = _setup_common_mocks(monkeypatch)
 
@@ -135,6 +209,41 @@ def test_download_csv(monkeypatch):
     assert "Value (USD millions)" in response.text
 
 
+def test_download_csv_includes_trend_columns(monkeypatch):
+    _setup_common_mocks(monkeypatch)
+    series = StatementSeries(
+        labels=["Revenue", "Net income"],
+        periods=["2023-12-31", "2022-12-31"],
+        values=np.array([[100.0, 80.0], [25.0, 16.0]]),
+        ratios=np.array([[1.0, 1.0], [0.25, 0.2]]),
+    )
+    received = []
+
+    def build_lines(facts, *, period="annual", peers=None):
+        received.append(facts)
+        return _build_lines()
+
+    def build_series(facts, *, period="annual", periods=5):
+        received.append(facts)
+        return series
+
+    monkeypatch.setitem(web._STATEMENT_BUILDERS, "income", build_lines)
+    monkeypatch.setitem(web._SERIES_BUILDERS, "income", build_series)
+    client = TestClient(web.create_app())
+
+    response = client.get(
+        "/download/csv",
+        params={"ticker": "demo", "statement": "income", "period": "annual", "history": 2},
+    )
+
+    assert response.status_code == 200
+    # The payload is indexed once and shared by both builders.
+    assert isinstance(received[0], FactIndex) and received[1] is received[0]
+    assert "Common Size 2023-12-31 (%)" in response.text
+    assert "Common Size 2022-12-31 (%)" in response.text
+    assert "20.0" in response.text
+
+
 def test_download_excel(monkeypatch):
     _setup_common_mocks(monkeypatch)
     client = TestClient(web.create_app())